@@ -1,6 +1,10 @@
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from django.views.decorators.http import require_safe
 
-@api_view(["GET"])
+from jhonatan_projects.page_cache import cached_page
+
+
+@require_safe
+@cached_page
 def render_project(request):
     return render(request, 'BREAST_CANCER.html')
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+APP_DIR = Path(__file__).resolve().parents[2]
+SOURCE = APP_DIR / "templates" / "DARWIN_FINCHES.html"
+TARGET = APP_DIR / "templates" / "DARWIN_FINCHES.build.html"
+STATIC_PREFIX = "darwin_finches/notebook"
+STATIC_DIR = APP_DIR / "static" / STATIC_PREFIX
+
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "gif": "gif", "svg+xml": "svg"}
+
+DATA_URI_RE = re.compile(r"data:image/([a-z+]+);base64,([A-Za-z0-9+/=\s]+)")
+STYLE_RE = re.compile(r"<style(?P<attrs>[^>]*)>(?P<css>.*?)</style>", re.S)
+IMG_RE = re.compile(r"<img\b(?![^>]*\bloading=)")
+
+# Inline <style> blocks larger than this are moved to a cacheable stylesheet.
+MIN_STYLE_SIZE = 2048
+
+
+def _write_static(content, extension):
+    name = f"{hashlib.sha256(content).hexdigest()[:16]}.{extension}"
+    path = STATIC_DIR / name
+    if not path.exists():
+        path.write_bytes(content)
+    return name
+
+
+class Command(BaseCommand):
+    help = (
+        "Build DARWIN_FINCHES.build.html from the notebook export: embedded "
+        "images and large stylesheets become hashed static files and images "
+        "are loaded lazily."
+    )
+
+    def handle(self, *args, **options):
+        STATIC_DIR.mkdir(parents=True, exist_ok=True)
+        for stale in STATIC_DIR.iterdir():
+            stale.unlink()
+        html = SOURCE.read_text(encoding="utf-8")
+        images = []
+
+        def extract_image(match):
+            extension = EXTENSIONS.get(match.group(1))
+            if extension is None:
+                return match.group(0)
+            content = base64.b64decode(re.sub(r"\s", "", match.group(2)))
+            images.append(_write_static(content, extension))
+            return images[-1]
+
+        def extract_style(match):
+            css = match.group("css")
+            if "scoped" in match.group("attrs") or len(css) < MIN_STYLE_SIZE:
+                return match.group(0)
+            # Images inside the stylesheet are referenced relative to it.
+            css = DATA_URI_RE.sub(extract_image, css)
+            name = _write_static(css.encode("utf-8"), "css")
+            return (
+                f'<link rel="stylesheet" '
+                f'href="{{% static \'{STATIC_PREFIX}/{name}\' %}}">'
+            )
+
+        html = STYLE_RE.sub(extract_style, html)
+        html = DATA_URI_RE.sub(
+            lambda m: "{%% static '%s/%s' %%}" % (STATIC_PREFIX, extract_image(m))
+            if m.group(1) in EXTENSIONS
+            else m.group(0),
+            html,
+        )
+        html = IMG_RE.sub('<img loading="lazy" decoding="async"', html)
+        TARGET.write_text("{% load static %}" + html, encoding="utf-8")
+
+        self.stdout.write(
+            f"{SOURCE.name}: {SOURCE.stat().st_size} bytes -> "
+            f"{TARGET.name}: {TARGET.stat().st_size} bytes, "
+            f"{len(images)} images extracted to {STATIC_DIR.relative_to(APP_DIR)}"
+        )
@@ -1,3 +1,127 @@
-from django.test import TestCase
+import base64
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from darwin_finches.management.commands import build_darwin_finches as build
+
+PNG = b"\x89PNG\r\n\x1a\nnot really a png"
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"></svg>'
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 "
+
+
+def data_uri(mime_type, content):
+    return f"data:image/{mime_type};base64,{base64.b64encode(content).decode()}"
+
+
+def hashed(content, extension):
+    return f"{hashlib.sha256(content).hexdigest()[:16]}.{extension}"
+
+
+class BuildCommandTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.static_dir = self.dir / "static"
+        for name, value in [
+            ("APP_DIR", self.dir),
+            ("SOURCE", self.dir / "source.html"),
+            ("TARGET", self.dir / "build.html"),
+            ("STATIC_DIR", self.static_dir),
+        ]:
+            patcher = mock.patch.object(build, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_build(self, html):
+        build.SOURCE.write_text(html, encoding="utf-8")
+        call_command("build_darwin_finches", stdout=StringIO())
+        return build.TARGET.read_text(encoding="utf-8")
+
+    def static(self, name):
+        return "{%% static '%s/%s' %%}" % (build.STATIC_PREFIX, name)
+
+    def test_images_become_hashed_static_files(self):
+        html = self.run_build(
+            f'<img src="{data_uri("png", PNG)}">'
+            f'<img src="{data_uri("svg+xml", SVG)}">'
+            f'<img src="{data_uri("webp", WEBP)}">'
+        )
+        png, svg = hashed(PNG, "png"), hashed(SVG, "svg")
+        self.assertEqual((self.static_dir / png).read_bytes(), PNG)
+        self.assertEqual((self.static_dir / svg).read_bytes(), SVG)
+        self.assertTrue(html.startswith("{% load static %}"))
+        self.assertIn(f'src="{self.static(png)}"', html)
+        self.assertIn(f'src="{self.static(svg)}"', html)
+        # Formats without a known extension stay embedded.
+        self.assertIn(data_uri("webp", WEBP), html)
+        self.assertEqual(len(list(self.static_dir.iterdir())), 2)
+
+    def test_large_stylesheets_are_extracted(self):
+        large = ".cell { margin: 0; }\n" * 200
+        logo = ".logo {{ background: url({}); }}"
+        css_with_image = large + logo.format(data_uri("png", PNG))
+        small = ".small { color: red; }"
+        html = self.run_build(
+            f"<style>{css_with_image}</style>"
+            f"<style>{small}</style>"
+            f"<style scoped>{large}</style>"
+        )
+        png = hashed(PNG, "png")
+        css = large + logo.format(png)
+        name = hashed(css.encode(), "css")
+        self.assertEqual((self.static_dir / name).read_text(), css)
+        self.assertEqual((self.static_dir / png).read_bytes(), PNG)
+        self.assertIn(f'<link rel="stylesheet" href="{self.static(name)}">', html)
+        self.assertIn(f"<style>{small}</style>", html)
+        self.assertIn(f"<style scoped>{large}</style>", html)
+
+    def test_images_are_loaded_lazily(self):
+        html = self.run_build(
+            '<img src="a.png"><img alt="b"\nsrc="b.png">'
+            '<img loading="eager" src="c.png">'
+        )
+        self.assertEqual(html.count('<img loading="lazy" decoding="async"'), 2)
+        self.assertIn('<img loading="lazy" decoding="async" src="a.png">', html)
+        self.assertIn('<img loading="eager" src="c.png">', html)
+
+    def test_rebuild_removes_stale_files(self):
+        self.run_build(f'<img src="{data_uri("png", PNG)}">')
+        self.run_build(f'<img src="{data_uri("svg+xml", SVG)}">')
+        self.assertEqual(
+            [path.name for path in self.static_dir.iterdir()], [hashed(SVG, "svg")]
+        )
+
+
+@override_settings(PAGE_CACHE={"ENABLED": False})
+class DarwinFinchesViewTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        (self.dir / "DARWIN_FINCHES.html").write_text("notebook export")
+        templates = [
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "DIRS": [self.dir],
+            }
+        ]
+        overrides = override_settings(TEMPLATES=templates)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_serves_build(self):
+        (self.dir / "DARWIN_FINCHES.build.html").write_text("optimized build")
+        response = self.client.get("/darwin_finches_project/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"optimized build")
+
+    def test_falls_back_to_export_without_build(self):
+        response = self.client.get("/darwin_finches_project/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"notebook export")
@@ -1,6 +1,16 @@
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from django.template import TemplateDoesNotExist
+from django.views.decorators.http import require_safe
 
-@api_view(["GET"])
+from jhonatan_projects.page_cache import cached_page
+
+
+@require_safe
+@cached_page
 def render_project_darwin_finches(request):
-    return render(request, 'DARWIN_FINCHES.html')
+    # Prefer the build from `manage.py build_darwin_finches`, it keeps images
+    # and stylesheets out of the HTML so the browser can cache them on their own.
+    try:
+        return render(request, 'DARWIN_FINCHES.build.html')
+    except TemplateDoesNotExist:
+        return render(request, 'DARWIN_FINCHES.html')
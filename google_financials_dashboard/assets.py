@@ -0,0 +1,162 @@
+"""
+Self-hosted stylesheets of the financials dashboard.
+
+The dashboard is styled with Tailwind utility classes and Font Awesome icons.
+Instead of compiling Tailwind in the browser with the CDN script and loading
+all of Font Awesome, ``manage.py build_dashboard_assets`` scans the
+``className`` strings of the Dash layout and writes
+
+* ``tailwind.css``: Tailwind's preflight plus only the utilities in use,
+  minified, built with the standalone Tailwind CLI (``tailwindcss-bin``),
+* ``fontawesome.css`` and ``webfonts/fa-solid-900.woff2``: the rules of the
+  icons in use and a solid font subset to their glyphs (``fontawesomefree``
+  and ``fontTools``).
+
+The files are committed to the app's static directory. collectstatic
+fingerprints and precompresses them like any other static file, and
+:func:`stylesheet_urls` gives the Dash app their hashed URLs. The build tools
+are only needed to rebuild the files after the layout's classes change.
+"""
+
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+STATIC_DIR = "google_financials_dashboard/dashboard"
+OUTPUT_DIR = Path(__file__).resolve().parent / "static" / STATIC_DIR
+
+STYLESHEETS = ("tailwind.css", "fontawesome.css")
+
+# The "fa" class draws with the solid style of the free font.
+ICON_FONT = "fa-solid-900"
+ICON_FONT_FACE = re.compile(
+    r'font-family:\s*"Font Awesome 6 Free";[^}]*font-weight:\s*900'
+)
+
+_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_CONTENT = re.compile(r'content:\s*"\\([0-9a-f]+)"')
+
+
+def stylesheet_urls():
+    """URLs of the built stylesheets, hashed once collectstatic has run."""
+    urls = []
+    for name in STYLESHEETS:
+        path = f"{STATIC_DIR}/{name}"
+        try:
+            urls.append(staticfiles_storage.url(path))
+        except ValueError:
+            # Not collected yet, served unhashed from the app directory.
+            urls.append(f"{settings.STATIC_URL}{path}")
+    return urls
+
+
+def layout_classes(layout):
+    """Every class named in a ``className`` of the ``layout`` component tree."""
+    classes = set()
+    for component in [layout, *layout._traverse()]:
+        class_name = getattr(component, "className", None)
+        if isinstance(class_name, str):
+            classes.update(class_name.split())
+    return classes
+
+
+def tailwind_executable():
+    try:
+        from tailwindcss_bin import find_tailwindcss_bin
+
+        return find_tailwindcss_bin()
+    except (ImportError, FileNotFoundError):
+        return shutil.which("tailwindcss")
+
+
+def build_tailwind(classes, output, executable):
+    """Write minified Tailwind CSS with only the utilities among ``classes``."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "classes.txt").write_text("\n".join(sorted(classes)))
+        (tmp / "input.css").write_text(
+            '@import "tailwindcss" source(none);\n@source "./classes.txt";\n'
+        )
+        subprocess.run(
+            [executable, "-i", str(tmp / "input.css"), "-o", str(output), "--minify"],
+            check=True,
+            capture_output=True,
+        )
+
+
+def _rules(css):
+    """Split ``css`` into top-level ``(prelude, body)`` pairs."""
+    rules, depth, start, prelude = [], 0, 0, ""
+    for i, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                prelude, start = css[start:i].strip(), i + 1
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[start:i]))
+                start = i + 1
+    return rules
+
+
+def _keep_selectors(prelude, classes):
+    """The selectors of ``prelude`` that only use ``classes``, or ``None``."""
+    kept = []
+    for selector in prelude.split(","):
+        names = _CLASS.findall(selector)
+        if names and set(names) <= classes or selector.strip() in (":root", ":host"):
+            kept.append(selector.strip())
+    return ",".join(kept) or None
+
+
+def subset_icon_css(css, classes):
+    """Rules of the Font Awesome stylesheet ``css`` that apply to ``classes``.
+
+    Returns the CSS and the code points of the icons it draws.
+    """
+    out, codepoints = [], set()
+    for prelude, body in _rules(css):
+        if prelude.startswith("@font-face"):
+            if ICON_FONT_FACE.search(body):
+                src = f'src:url(webfonts/{ICON_FONT}.woff2) format("woff2")'
+                out.append(f"@font-face{{{re.sub(r'src:[^;}]*', src, body)}}}")
+        elif prelude.startswith("@media"):
+            inner = subset_icon_css(body, classes)[0]
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif not prelude.startswith("@"):
+            selectors = _keep_selectors(prelude, classes)
+            if selectors:
+                out.append(f"{selectors}{{{body}}}")
+                codepoints.update(int(c, 16) for c in _CONTENT.findall(body))
+    return "".join(out), codepoints
+
+
+def build_icons(classes, directory):
+    """Write ``fontawesome.css`` and the font subset for the icons in ``classes``."""
+    import fontawesomefree
+    from fontTools import subset
+
+    package = Path(fontawesomefree.__file__).parent / "static" / "fontawesomefree"
+    source = (package / "css" / "all.min.css").read_text()
+    license_comment = source[: source.index("*/") + 2]
+    css, codepoints = subset_icon_css(source[len(license_comment) :], classes)
+    (directory / "fontawesome.css").write_text(f"{license_comment}\n{css}\n")
+
+    fonts = directory / "webfonts"
+    fonts.mkdir(exist_ok=True)
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = []
+    font = subset.load_font(str(package / "webfonts" / f"{ICON_FONT}.woff2"), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(fonts / f"{ICON_FONT}.woff2"), options)
+    return codepoints
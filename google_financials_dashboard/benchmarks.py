@@ -0,0 +1,349 @@
+"""
+Benchmarks of the dashboard's data pipeline, stage by stage.
+
+Every size runs against fresh caches filled by the offline
+:class:`~google_financials_dashboard.providers.FixtureProvider`, so results do
+not depend on the network and are comparable between runs. Each stage is timed
+``repeat`` times and then run once more under ``tracemalloc`` for its peak
+memory, since tracing would distort the timings. The memory one ticker's
+price history keeps is measured separately for each way it can be held, and
+the size of the callback figures as plain JSON and with typed arrays.
+
+The speed of a machine, and of a shared runner even from one second to the
+next, varies a lot. Every run of a stage is therefore paired with a run of a
+small fixed calibration workload right before it, and the stage is judged on
+its median time relative to the calibration, which both runs of a pair
+measure at the same machine speed. On a noisy VM this ratio moves by a few
+percent where the raw timings move by half. The whole benchmark runs for
+several rounds, and each statistic is the median of its per-round values, so
+a single disturbed round neither fails nor hides a regression.
+"""
+
+import gc
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+from google_financials_dashboard.encoding import figure_to_json
+from google_financials_dashboard.figures import (
+    _build_candlestick,
+    _build_revenue_fcf,
+    figure_cache,
+)
+from google_financials_dashboard.key_facts import compute_key_facts, statements_by_year
+from google_financials_dashboard.market_data import (
+    DATASETS,
+    MarketDataService,
+    get_service,
+)
+from google_financials_dashboard.price_history import PriceHistory
+from google_financials_dashboard.shared_cache import decode, encode, get_cache
+from google_financials_dashboard.tickers import get_ticker_data
+
+CALLBACK_URL = "/django_plotly_dash/app/google_dashboard/_dash-update-component"
+
+DEFAULT_SIZES = (1, 10, 50)
+
+DEFAULT_ROUNDS = 3
+
+# A stage regresses when its calibrated median grows by more than the tolerance
+# and by at least this much, so the jitter of sub-millisecond stages never
+# fails a run.
+MIN_DELTA_MS = 0.5
+
+# Result keys that are not a size's stage timings.
+REPORTS = ("calibration", "history_memory", "payload")
+
+
+def measure(stage, repeat):
+    """Latency in ms and peak traced memory in KB of ``stage()``.
+
+    ``relative`` is the median of each run's time over the time of the
+    calibration workload run just before it, ``calibration_ms`` the median
+    time of those calibration runs.
+    """
+    timings = []
+    calibration = []
+    # Like timeit, keep collector pauses out of the timings.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _calibration_workload()
+            middle = time.perf_counter()
+            stage()
+            end = time.perf_counter()
+            calibration.append((middle - start) * 1000)
+            timings.append((end - middle) * 1000)
+    finally:
+        gc.enable()
+    relative = statistics.median(t / c for t, c in zip(timings, calibration))
+    timings.sort()
+    tracemalloc.start()
+    try:
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "min": round(timings[0], 3),
+        "p50": round(statistics.median(timings), 3),
+        "p95": round(timings[max(int(len(timings) * 0.95) - 1, 0)], 3),
+        "peak_kb": round(peak / 1024, 1),
+        "relative": round(relative, 4),
+        "calibration_ms": round(statistics.median(calibration), 3),
+    }
+
+
+def _callback_body(ticker):
+    # Imported late, the Dash app registers itself with django_plotly_dash.
+    from google_financials_dashboard.management.commands.loadtest import (
+        plot_callback_body,
+    )
+
+    return json.dumps(plot_callback_body(ticker))
+
+
+def _stages(ticker, service):
+    ticker_data = get_ticker_data(ticker)
+    financials = service.get(ticker, "financials")
+    cashflow = service.get(ticker, "cashflow")
+    statements = statements_by_year(financials, cashflow)
+    figures = [
+        _build_revenue_fcf(ticker_data),
+        _build_candlestick(ticker_data, None, None),
+    ]
+    client = Client()
+    body = _callback_body(ticker)
+
+    def load():
+        # A new service has an empty memory cache and reads every dataset from
+        # the shared cache.
+        fresh = MarketDataService(
+            service.cache_dir,
+            service.ttl,
+            service.refresh_interval,
+            service.provider,
+            service.prices.history_years,
+            cache_alias=service.cache_alias,
+        )
+        fresh.background = False
+        for dataset in DATASETS:
+            fresh.get(ticker, dataset)
+
+    def callback(cold):
+        def run():
+            if cold:
+                figure_cache.clear()
+                # Also drops the shared datasets, the service keeps them in memory.
+                get_cache().clear()
+            response = client.post(CALLBACK_URL, body, content_type="application/json")
+            assert response.status_code == 200, response.status_code
+
+        return run
+
+    return {
+        "load": load,
+        "merge": lambda: statements_by_year(financials, cashflow),
+        "key_facts": lambda: compute_key_facts(statements),
+        "figure_build": lambda: [
+            _build_revenue_fcf(ticker_data),
+            _build_candlestick(ticker_data, None, None),
+        ],
+        "serialize": lambda: [figure_to_json(fig, binary=False) for fig in figures],
+        "serialize_binary": lambda: [
+            figure_to_json(fig, binary=True) for fig in figures
+        ],
+        "callback_cold": callback(cold=True),
+        "callback": callback(cold=False),
+    }
+
+
+def _retained_kb(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return value, round(size / 1024, 1)
+
+
+def history_memory(frame, directory):
+    """Memory in KB that the price history ``frame`` keeps in each representation.
+
+    ``frame`` is the DataFrame the service held before, ``compact`` the
+    :class:`PriceHistory` it holds now and ``mmap`` the heap left by a
+    memory-mapped one, whose ``mapped`` bytes live in the shared page cache.
+    """
+    data = encode(frame)
+    path = Path(directory) / "history.bin"
+    PriceHistory.from_frame(frame).save(path)
+    # A deep copy, the buffers of a frame read from Parquet are not traced.
+    _, frame_kb = _retained_kb(lambda: decode(data).copy())
+    _, compact_kb = _retained_kb(lambda: PriceHistory.from_frame(frame))
+    _, mmap_kb = _retained_kb(lambda: PriceHistory.load(path, mmap=True))
+    return {
+        "frame_kb": frame_kb,
+        "compact_kb": compact_kb,
+        "mmap_kb": mmap_kb,
+        "mapped_kb": round(path.stat().st_size / 1024, 1),
+    }
+
+
+def payload_sizes(ticker):
+    """KB of the callback figures of ``ticker`` as JSON lists and as typed arrays."""
+    ticker_data = get_ticker_data(ticker)
+    figures = [
+        _build_revenue_fcf(ticker_data),
+        _build_candlestick(ticker_data, None, None),
+    ]
+    return {
+        name: round(
+            sum(len(figure_to_json(fig, binary=binary)) for fig in figures) / 1024,
+            1,
+        )
+        for name, binary in (("json_kb", False), ("binary_kb", True))
+    }
+
+
+def _calibration_workload():
+    # A few ms of the same pandas and JSON work the stages do.
+    frame = pd.DataFrame(
+        {"key": np.arange(2_000) % 97, "value": np.linspace(0, 1, 2_000)}
+    )
+    frame.groupby("key")["value"].agg(["mean", "max"])
+    json.dumps(frame["value"].tolist())
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES, repeat=20, frequency="1d", rounds=DEFAULT_ROUNDS
+):
+    """Benchmark every stage for ``sizes`` years of data, keyed by size and stage.
+
+    Timings are the median over ``rounds`` rounds of each statistic.
+    """
+    runs = [_run_round(sizes, repeat, frequency) for _ in range(max(rounds, 1))]
+    results = dict(runs[0])
+    for size, stages in runs[0].items():
+        if size in REPORTS:
+            continue
+        results[size] = {
+            stage: {
+                key: round(statistics.median(run[size][stage][key] for run in runs), 4)
+                for key in stats
+            }
+            for stage, stats in stages.items()
+        }
+    results["calibration"] = {
+        "p50": round(
+            statistics.median(
+                r["calibration_ms"]
+                for size, stages in results.items()
+                if size not in REPORTS
+                for r in stages.values()
+            ),
+            3,
+        )
+    }
+    return results
+
+
+def _run_round(sizes, repeat, frequency):
+    results = {}
+    memory = {}
+    payload = {}
+    for years in sizes:
+        ticker = f"BENCH{years}Y"
+        origin = date.today() - timedelta(days=round(365.25 * years))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            market_data = {
+                "CACHE_DIR": cache_dir,
+                "HISTORY_YEARS": years,
+                "CACHE": "benchmark",
+                "PROVIDER": {
+                    "BACKEND": "google_financials_dashboard.providers.FixtureProvider",
+                    "OPTIONS": {
+                        "origin": origin,
+                        "frequency": frequency,
+                        "statement_years": years,
+                    },
+                },
+            }
+            caches = {
+                **settings.CACHES,
+                "benchmark": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "benchmark",
+                },
+            }
+            with override_settings(MARKET_DATA=market_data, CACHES=caches):
+                service = get_service()
+                service.background = False
+                figure_cache.clear()
+                stages = _stages(ticker, service)
+                results[f"{years}y"] = {
+                    name: measure(stage, repeat) for name, stage in stages.items()
+                }
+                payload[f"{years}y"] = payload_sizes(ticker)
+                frame = service.provider.history(ticker, origin)
+                memory[f"{years}y"] = history_memory(frame, cache_dir)
+        figure_cache.clear()
+    results["history_memory"] = memory
+    results["payload"] = payload
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Describe every stage of ``results`` that regressed against ``baseline``."""
+    regressions = []
+    for size, stages in results.items():
+        if size in REPORTS:
+            continue
+        for stage, current in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if previous is None or "relative" not in previous:
+                continue
+            # Both in ms at the machine speed of this run's calibration.
+            expected = previous["relative"] * current["calibration_ms"]
+            median = current["relative"] * current["calibration_ms"]
+            if median > max(expected * (1 + tolerance), expected + MIN_DELTA_MS):
+                regressions.append(
+                    f"{size} {stage}: median {median:.2f} ms, "
+                    f"baseline {expected:.2f} ms at this machine speed"
+                )
+            if current["peak_kb"] > previous["peak_kb"] * (1 + tolerance):
+                regressions.append(
+                    f"{size} {stage}: peak {current['peak_kb']:.0f} KB, "
+                    f"baseline {previous['peak_kb']:.0f} KB"
+                )
+    for size, current in results.get("history_memory", {}).items():
+        previous = baseline.get("history_memory", {}).get(size)
+        if previous and current["compact_kb"] > previous["compact_kb"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{size} price history: {current['compact_kb']:.0f} KB, "
+                f"baseline {previous['compact_kb']:.0f} KB"
+            )
+    for size, current in results.get("payload", {}).items():
+        previous = baseline.get("payload", {}).get(size)
+        if previous and current["binary_kb"] > previous["binary_kb"] * (1 + tolerance):
+            regressions.append(
+                f"{size} typed array payload: {current['binary_kb']:.0f} KB, "
+                f"baseline {previous['binary_kb']:.0f} KB"
+            )
+    return regressions
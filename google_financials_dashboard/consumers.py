@@ -0,0 +1,42 @@
+import asyncio
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from google_financials_dashboard.live import last_close, updates
+from google_financials_dashboard.market_data import MarketDataUnavailable
+from google_financials_dashboard.tickers import aget_ticker_data, normalize_ticker
+
+
+class LiveBarsConsumer(AsyncJsonWebsocketConsumer):
+    """Push the new bars of a ticker's simulated live session.
+
+    The query string carries the session and the number of bars the browser
+    already shows, see :func:`google_financials_dashboard.live.live_figure`.
+    """
+
+    task = None
+
+    async def connect(self):
+        query = parse_qs(self.scope["query_string"].decode())
+        try:
+            ticker = normalize_ticker(self.scope["url_route"]["kwargs"]["ticker"])
+            session = int(query["session"][0])
+            count = int(query["count"][0])
+            ticker_data = await aget_ticker_data(ticker)
+        except (KeyError, ValueError, MarketDataUnavailable):
+            await self.close()
+            return
+        await self.accept()
+        self.task = asyncio.create_task(
+            self.stream(updates(ticker, last_close(ticker_data), session, count))
+        )
+
+    async def stream(self, messages):
+        async for message in messages:
+            await self.send_json(message)
+        await self.close()
+
+    async def disconnect(self, code):
+        if self.task is not None:
+            self.task.cancel()
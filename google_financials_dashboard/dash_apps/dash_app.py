@@ -1,48 +1,50 @@
-import yfinance as yf
+import copy
+import logging
+import math
+import time
+
 from dash import dcc, html, Output, Input
-import plotly.graph_objects as go
-import pandas as pd
-from datetime import date
+from dash.exceptions import PreventUpdate
+from django.conf import settings
 from django_plotly_dash import DjangoDash
 
-ticker = "GOOGL"
-netflix = yf.Ticker(ticker)
-financials = netflix.financials  # Income Statement
-balance_sheet = netflix.balance_sheet
-cashflow = netflix.cashflow
-netflix_data = yf.download(ticker, start="2014-10-29", end="2024-10-29")
-data = pd.DataFrame(netflix_data)
-if isinstance(data.columns, pd.MultiIndex):
-    data.columns = data.columns.map(lambda x: x[0] if isinstance(x, tuple) else x)
-
-data.reset_index(inplace=True)
-
-financials = pd.DataFrame(financials.T)
-cashflow = pd.DataFrame(cashflow.T)
-result = financials.join(cashflow)[
-    ["Total Revenue", "Free Cash Flow", "Cost Of Revenue"]
-]
-result.dropna(inplace=True)
-x = [i.year for i in result.index]
-result["year"] = [i.year for i in result.index]
-
-cagr = (
-    result[result["year"] == date.today().year - 1]["Total Revenue"].iloc[0]
-    / result[result["year"] == date.today().year - 4]["Total Revenue"].iloc[0]
-) ** (1 / 4) - 1
-ltm_gm = (
-    result[result["year"] == date.today().year - 1]["Total Revenue"].iloc[0]
-    - result[result["year"] == date.today().year - 1]["Cost Of Revenue"].iloc[0]
-) / result[result["year"] == date.today().year - 1]["Total Revenue"].iloc[0]
-ltm_fcf = (
-    result[result["year"] == date.today().year - 1]["Free Cash Flow"].iloc[0]
-    / result[result["year"] == date.today().year - 1]["Total Revenue"].iloc[0]
+from google_financials_dashboard.assets import stylesheet_urls
+from google_financials_dashboard.figures import (
+    candlestick_figure,
+    revenue_fcf_figure,
+    unavailable_figure,
 )
+from google_financials_dashboard.indicators import PRESETS
+from google_financials_dashboard.key_facts import CAGR_YEARS
+from google_financials_dashboard.live import live_figure
+from google_financials_dashboard.market_data import MarketDataUnavailable, get_service
+from google_financials_dashboard.ohlc import parse_relayout
+from google_financials_dashboard.tickers import available_tickers, get_ticker_data
+from google_financials_dashboard.valuation import ASSUMPTIONS, PATHS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICKER = "GOOGL"
+
+# With PRERENDER on, the layout already carries the default ticker's figures and
+# key facts, so the browser skips the initial callback round trip.
+PRERENDER = getattr(settings, "FINANCIALS_DASHBOARD", {}).get("PRERENDER", True)
+
+# Seconds the error layout is served before loading the default ticker again.
+RETRY_AFTER = getattr(settings, "FINANCIALS_DASHBOARD", {}).get("RETRY_AFTER", 30)
+
+UNAVAILABLE = "No data for {} right now, reload to retry"
 
-stock = yf.Ticker(ticker)
-forward_eps = stock.info.get("forwardEps")  # Forward EPS
-forward_pe_ratio = stock.info.get("forwardPE")  # Forward P/E ratio
-fair_value = forward_eps * forward_pe_ratio
+PLOT_OUTPUTS = [
+    ("revenue_fcf", "figure"),
+    ("kpi-cagr", "children"),
+    ("kpi-ltm-gm", "children"),
+    ("kpi-ltm-fcf", "children"),
+    ("kpi-fair-value", "children"),
+    ("kpi-fair-value-label", "children"),
+    ("kpi-ltm-gm-label", "children"),
+    ("kpi-ltm-fcf-label", "children"),
+]
 
 
 def set_config(img_name):
@@ -69,20 +71,51 @@ def set_config(img_name):
     }
 
 
-external_scripts = [
-    {"src": "https://cdn.tailwindcss.com"},
-]
-external_stylesheets = [
-    "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css"
-]
+def assumption_item(label, value):
+    return html.Li(
+        [html.Span(f"●   {label}:"), html.Span(value)],
+        className="flex flex-row justify-between",
+    )
+
+
+def valuation_assumptions():
+    """Valuation panel text, from the assumptions the DCF actually uses."""
+    stage = ASSUMPTIONS["STAGE_YEARS"]
+    return [
+        html.P(
+            f"Monte Carlo DCF over {PATHS:,} paths, at the average FCF margin "
+            f"of the last {ASSUMPTIONS['MARGIN_YEARS']} years, less net debt.",
+            className="text-justify italic",
+        ),
+        html.Ul(
+            children=[
+                assumption_item(f"1-{stage} years", "revenue CAGR"),
+                assumption_item(
+                    f"{stage + 1}-{2 * stage} years",
+                    f"{ASSUMPTIONS['FADE']:.0%} of it",
+                ),
+                assumption_item(
+                    "Terminal multiple", f"{ASSUMPTIONS['TERMINAL_MULTIPLE']:g}x"
+                ),
+                assumption_item(
+                    "Discount rate",
+                    f"{ASSUMPTIONS['DISCOUNT_RATE']:.0%} "
+                    f"± {ASSUMPTIONS['DISCOUNT_RATE_SIGMA']:.1%}",
+                ),
+            ]
+        ),
+    ]
+
+
+# Purged Tailwind and Font Awesome subset, see manage.py build_dashboard_assets.
+external_stylesheets = stylesheet_urls()
 app = DjangoDash(
     'google_dashboard',
-    external_scripts=external_scripts,
     external_stylesheets=external_stylesheets,
 )
 app.title = "Financial Google Dashboard"
 app._favicon = "favicon.ico"
-app.layout = html.Div(
+base_layout = html.Div(
     className="w-full flex flex-col justify-center items-center",
     children=[
         html.Div(
@@ -93,6 +126,18 @@ app.layout = html.Div(
                 )
             ]
         ),
+        html.Div(
+            children=[
+                dcc.Dropdown(
+                    id="ticker",
+                    options=available_tickers(),
+                    value=DEFAULT_TICKER,
+                    clearable=False,
+                    searchable=True,
+                ),
+            ],
+            className="w-[200px] mb-4",
+        ),
         html.Div(
             children=[
                 html.Div(className="flex-grow bg-black h-0.5"),
@@ -112,12 +157,11 @@ app.layout = html.Div(
                         html.Div(
                             children=[
                                 html.H2(
-                                    f"{round(cagr*100,2)}%",
+                                    id="kpi-cagr",
                                     className="text-white text-xl",
                                 ),
                                 html.H4(
-                                    # TODO
-                                    "4 year stock CARG",
+                                    f"{CAGR_YEARS[0]} year revenue CAGR",
                                     className="text-white text-[10px]",
                                 ),
                             ]
@@ -134,11 +178,11 @@ app.layout = html.Div(
                         html.Div(
                             children=[
                                 html.H2(
-                                    f"{round(ltm_gm * 100, 2)}%",
+                                    id="kpi-ltm-gm",
                                     className="text-white text-xl",
                                 ),
                                 html.H4(
-                                    f"LMT Gross margin {date.today().year-1}",
+                                    id="kpi-ltm-gm-label",
                                     className="text-white text-[10px]",
                                 ),
                             ]
@@ -154,11 +198,11 @@ app.layout = html.Div(
                         html.Div(
                             children=[
                                 html.H2(
-                                    f"{round(ltm_fcf * 100, 2)}%",
+                                    id="kpi-ltm-fcf",
                                     className="text-white text-xl",
                                 ),
                                 html.H4(
-                                    f"LMT Free Cash Flow {date.today().year-1}",
+                                    id="kpi-ltm-fcf-label",
                                     className="text-white text-[10px]",
                                 ),
                             ]
@@ -175,11 +219,13 @@ app.layout = html.Div(
                         html.Div(
                             children=[
                                 html.H2(
-                                    f"${round(fair_value,2)}",
+                                    id="kpi-fair-value",
                                     className="text-white text-xl",
                                 ),
                                 html.H4(
-                                    "Est. Fair value", className="text-white text-[10px]"
+                                    "Est. Fair value",
+                                    id="kpi-fair-value-label",
+                                    className="text-white text-[10px]",
                                 ),
                             ]
                         ),
@@ -202,6 +248,28 @@ app.layout = html.Div(
                 html.Div(
                     children=[
                         html.H1("Stock market value", className="font-bold text-3xl"),
+                        html.Div(
+                            children=[
+                                dcc.Checklist(
+                                    id="live",
+                                    options=[{"label": " Live", "value": "live"}],
+                                    value=[],
+                                ),
+                                html.Span(id="live-status", className="text-xs"),
+                            ],
+                            className="flex flex-row justify-center gap-2",
+                        ),
+                        dcc.Checklist(
+                            id="indicators",
+                            options=[
+                                {"label": f" {label}", "value": preset}
+                                for preset, (_, _, label) in PRESETS.items()
+                            ],
+                            value=[],
+                            inline=True,
+                            className="flex flex-row justify-center gap-2 text-xs",
+                        ),
+                        dcc.Store(id="live-session"),
                         dcc.Graph(
                             id="candle_stick", config=set_config("historical_data")
                         ),
@@ -697,90 +765,8 @@ app.layout = html.Div(
                         html.Div(
                             children=[
                                 html.Div(
-                                    children=[
-                                        html.P(
-                                            "Assumed FCF growth at current price ($702) and flat FCF margins.",
-                                            className="text-justify italic",
-                                        ),
-                                        html.Ul(
-                                            children=[
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   1-5 years:"),
-                                                        html.Span("20%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   6-10 years:"),
-                                                        html.Span("15%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span(
-                                                            "●   Terminal multiple:"
-                                                        ),
-                                                        html.Span("15x"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   Discount rate:"),
-                                                        html.Span("10%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                            ]
-                                        ),
-                                    ],
-                                    className="w-[40%]",
-                                ),
-                                html.Div(
-                                    children=[
-                                        html.P(
-                                            "Assuming a declining FCF growth and flat FCF margins.",
-                                            className="text-justify italic",
-                                        ),
-                                        html.Ul(
-                                            children=[
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   1-5 years:"),
-                                                        html.Span("18%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   6-10 years:"),
-                                                        html.Span("13%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span(
-                                                            "●   Terminal multiple:"
-                                                        ),
-                                                        html.Span("15x"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                                html.Li(
-                                                    [
-                                                        html.Span("●   Discount rate:"),
-                                                        html.Span("10%"),
-                                                    ],
-                                                    className="flex flex-row justify-between",
-                                                ),
-                                            ]
-                                        ),
-                                    ],
-                                    className="w-[40%]",
+                                    children=valuation_assumptions(),
+                                    className="w-[80%]",
                                 ),
                             ],
                             className="flex flex-row justify-around",
@@ -791,60 +777,253 @@ app.layout = html.Div(
             ],
             className="flex flex-row w-[80%] mb-14",
         ),
-        dcc.Store(id="dummy-store"),
     ],
 )
 
 
-@app.callback(
-    [Output("revenue_fcf", "figure"), Output("candle_stick", "figure")],
-    [Input("dummy-store", "data")],
-)
-def plot(data_dummy):
-    fig1 = go.Figure()
-    fig1.add_trace(
-        go.Bar(
-            x=x,
-            y=result["Total Revenue"],
-            marker_color="lightslategrey",
-            base=0,
-            name="Revenue",
-        )
-    )
-    fig1.add_trace(
-        go.Bar(
-            x=x,
-            y=result["Free Cash Flow"],
-            base=[-100000000],
-            marker_color="crimson",
-            name="Free Cash Flow",
-        )
-    )
-    fig1.update_layout(
-        title="Values in Billions of Dollars",
-        margin=dict(t=26, b=0, l=40, r=0),
-        height=300,
-        legend=dict(
-            x=0.8,
-            y=1.12,
-            xanchor="center",
-            yanchor="top",  # Anchor the legend at the bottom on the y-axis
-            orientation="h",  # Horizontal orientation
-        ),
+def percent_text(value):
+    """``value`` as a KPI percentage, "n/a" when the statements cannot give one."""
+    if value is None or not math.isfinite(value):
+        return "n/a"
+    return f"{round(value * 100, 2)}%"
+
+
+def fair_value_texts(valuation):
+    """Fair value KPI and its label for a DCF ``valuation``."""
+    if valuation is None:
+        return "n/a", "Est. Fair value"
+    return (
+        f"${valuation['p50']:,.2f}",
+        f"Est. Fair value, P10-P90 ${valuation['p10']:,.2f}-${valuation['p90']:,.2f}",
     )
-    fig2 = go.Figure(
-        data=[
-            go.Candlestick(
-                x=data["Date"],
-                open=data["Open"],
-                high=data["High"],
-                low=data["Low"],
-                close=data["Close"],
-            )
-        ]
+
+
+def unavailable_values(ticker):
+    """Values of ``PLOT_OUTPUTS`` when the data of ``ticker`` cannot be loaded."""
+    return (
+        unavailable_figure(UNAVAILABLE.format(ticker)),
+        "n/a",
+        "n/a",
+        "n/a",
+        "n/a",
+        "Est. Fair value",
+        "LMT Gross margin",
+        "LMT Free Cash Flow",
     )
-    fig2.update_layout(
-        title="Values in Dollars", margin=dict(t=26, b=0, l=0, r=40), height=300
+
+
+def plot_values(ticker_data):
+    """Values of ``PLOT_OUTPUTS`` for ``ticker_data``."""
+    return (
+        revenue_fcf_figure(ticker_data),
+        percent_text(ticker_data.cagr),
+        percent_text(ticker_data.ltm_gm),
+        percent_text(ticker_data.ltm_fcf),
+        *fair_value_texts(ticker_data.valuation),
+        f"LMT Gross margin {ticker_data.year}",
+        f"LMT Free Cash Flow {ticker_data.year}",
     )
-    return fig1, fig2
 
+
+# (data version, layout, retry time) of the last pre-rendered layout. Dash also
+# calls the layout function whenever django_plotly_dash builds an app instance,
+# which happens on every callback, so the filled-in copy is reused until the
+# service has newer data, and an error layout (version None) until the retry
+# time, without touching the ticker cache or upstream in between.
+_prerendered = None
+
+
+def _prerender():
+    global _prerendered
+    cached = _prerendered
+    if cached is not None:
+        version, layout, retry_at = cached
+        if version is None:
+            if time.monotonic() < retry_at:
+                return version, layout
+        else:
+            current = get_service().version(DEFAULT_TICKER)
+            if current and version >= current:
+                return version, layout
+    try:
+        ticker_data = get_ticker_data(DEFAULT_TICKER)
+    except (ValueError, MarketDataUnavailable):
+        logger.warning("Could not pre-render the dashboard for %s", DEFAULT_TICKER)
+        ticker_data = None
+    layout = copy.deepcopy(base_layout)
+    if ticker_data is None:
+        version = None
+        values = list(zip(PLOT_OUTPUTS, unavailable_values(DEFAULT_TICKER)))
+        figure = unavailable_figure(UNAVAILABLE.format(DEFAULT_TICKER))
+        values.append((("candle_stick", "figure"), figure))
+    else:
+        version = ticker_data.version
+        values = list(zip(PLOT_OUTPUTS, plot_values(ticker_data)))
+        values.append((("candle_stick", "figure"), candlestick_figure(ticker_data)))
+    for (component_id, prop), value in values:
+        setattr(layout[component_id], prop, value)
+    _prerendered = (version, layout, time.monotonic() + RETRY_AFTER)
+    return version, layout
+
+
+def serve_layout():
+    """Layout with the default ticker's figures and key facts filled in.
+
+    The initial callbacks are skipped, so when the data cannot be loaded the
+    outputs are filled with an error state instead of staying blank.
+    """
+    if not PRERENDER:
+        return base_layout
+    return _prerender()[1]
+
+
+app.layout = serve_layout
+
+
+def layout_version():
+    """Data version ``serve_layout`` fills in, ``None`` for the bare layout."""
+    if not PRERENDER:
+        return None
+    return _prerender()[0]
+
+
+@app.callback(
+    [Output(component_id, prop) for component_id, prop in PLOT_OUTPUTS],
+    [Input("ticker", "value")],
+    prevent_initial_call=PRERENDER,
+)
+def plot(ticker):
+    try:
+        ticker_data = get_ticker_data(ticker)
+    except (ValueError, MarketDataUnavailable):
+        return unavailable_values(ticker)
+    return plot_values(ticker_data)
+
+
+@app.callback(
+    Output("candle_stick", "figure"),
+    [
+        Input("ticker", "value"),
+        Input("candle_stick", "relayoutData"),
+        Input("live", "value"),
+        Input("live-session", "data"),
+        Input("indicators", "value"),
+    ],
+    prevent_initial_call=PRERENDER,
+)
+def plot_candlestick(
+    ticker, relayout_data, live, session, indicators, callback_context=None
+):
+    triggered = [t["prop_id"] for t in getattr(callback_context, "triggered", [])]
+    relayout = any(t.startswith("candle_stick.") for t in triggered)
+    if live and relayout:
+        # Zooming into the session is done by plotly in the browser.
+        raise PreventUpdate
+    if relayout and parse_relayout(relayout_data) is None:
+        raise PreventUpdate
+    try:
+        ticker_data = get_ticker_data(ticker)
+    except (ValueError, MarketDataUnavailable):
+        return unavailable_figure(UNAVAILABLE.format(ticker))
+    if live:
+        return live_figure(ticker_data)
+    visible = (None, None)
+    # Keep the zoom when toggling indicators.
+    if relayout or triggered == ["indicators.value"]:
+        unit = ticker_data.history.unit
+        visible = parse_relayout(relayout_data, unit) or visible
+    return candlestick_figure(ticker_data, *visible, indicators or ())
+
+
+# Runs in the browser whenever the candlestick is re-rendered. A live figure
+# carries its websocket in layout.meta.live; the bars pushed there are appended
+# with extendData, so only new points go over the wire. When the socket cannot
+# be opened, e.g. on App Engine standard, the same updates are polled over HTTP
+# once per simulated minute. A new session makes the server render the figure
+# again through the live-session store.
+app.clientside_callback(
+    """
+    function (figure) {
+        const state = window.dashboardLive || (window.dashboardLive = {});
+        if (state.socket) {
+            state.socket.onclose = null;
+            state.socket.close();
+            state.socket = null;
+        }
+        if (state.timer) {
+            clearInterval(state.timer);
+            state.timer = null;
+        }
+        const live = figure && figure.layout.meta && figure.layout.meta.live;
+        if (!live) {
+            return "";
+        }
+        let count = live.count;
+        const handle = function (message) {
+            if (message.type === "bars") {
+                const bars = message.bars;
+                count += bars.x.length;
+                dash_clientside.set_props("candle_stick", {
+                    extendData: [
+                        {
+                            x: [bars.x],
+                            open: [bars.open],
+                            high: [bars.high],
+                            low: [bars.low],
+                            close: [bars.close],
+                        },
+                        [0],
+                        live.max_points,
+                    ],
+                });
+            } else if (message.type === "reset") {
+                dash_clientside.set_props("live-session", {data: message.session});
+            }
+        };
+        const poll = function () {
+            let busy = false;
+            state.timer = setInterval(function () {
+                if (busy) {
+                    return;
+                }
+                busy = true;
+                fetch(live.poll_url + "?session=" + live.session + "&count=" + count)
+                    .then(function (response) { return response.json(); })
+                    .then(function (message) {
+                        if (message.type === "reset") {
+                            clearInterval(state.timer);
+                            state.timer = null;
+                        }
+                        handle(message);
+                    })
+                    .catch(function () {
+                        dash_clientside.set_props("live-status", {children: "disconnected"});
+                    })
+                    .finally(function () { busy = false; });
+            }, live.interval_ms);
+        };
+        const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+        const socket = new WebSocket(scheme + "://" + window.location.host + live.url);
+        let opened = false;
+        socket.onopen = function () {
+            opened = true;
+        };
+        socket.onmessage = function (event) {
+            handle(JSON.parse(event.data));
+        };
+        socket.onclose = function () {
+            state.socket = null;
+            if (opened) {
+                dash_clientside.set_props("live-status", {children: "disconnected"});
+                return;
+            }
+            dash_clientside.set_props("live-status", {children: "polling"});
+            poll();
+        };
+        state.socket = socket;
+        return "streaming";
+    }
+    """,
+    Output("live-status", "children"),
+    Input("candle_stick", "figure"),
+)
@@ -0,0 +1,97 @@
+"""
+Compact figure encoding for dashboard callbacks.
+
+Plotly.js (>= 2.28) accepts typed arrays as ``{"dtype": ..., "bdata": ...}``
+objects holding base64 encoded little-endian buffers. Numeric trace arrays are
+shipped that way instead of JSON lists of floats, and ISO date arrays as
+milliseconds since the epoch on a ``date`` typed axis. Both the payload and the
+time spent JSON-encoding it shrink considerably for long series. Candlestick
+prices are stored as float32 (see :mod:`~google_financials_dashboard.price_history`)
+and shipped as ``f4``, twice as small as ``f8`` and just as precise.
+"""
+
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from plotly.utils import PlotlyJSONEncoder
+
+# Trace attributes holding one value per point.
+ARRAY_KEYS = ("x", "y", "open", "high", "low", "close", "base")
+
+# OHLC prices, float32 where they are stored.
+PRICE_KEYS = ("open", "high", "low", "close")
+
+# Arrays shorter than this stay plain JSON, the base64 overhead is not worth it.
+MIN_LENGTH = 32
+
+
+def binary_figures_enabled():
+    return getattr(settings, "FINANCIALS_DASHBOARD", {}).get("BINARY_FIGURES", False)
+
+
+def typed_array(values, dtype="f8"):
+    """Plotly.js typed array spec of ``values``."""
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {"dtype": dtype, "bdata": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def _encode_values(values, allow_dates, single=False):
+    """Return ``(spec, is_date)`` for ``values`` or ``None`` if it is kept as is.
+
+    ``single`` encodes floats as ``f4``.
+    """
+    if not isinstance(values, np.ndarray) or values.ndim != 1 or len(values) < MIN_LENGTH:
+        return None
+    if values.dtype.kind in "iu":
+        info = np.iinfo(np.int32)
+        if values.min() >= info.min and values.max() <= info.max:
+            return typed_array(values, "i4"), False
+        return typed_array(values, "f8"), False
+    if values.dtype.kind == "f":
+        single = single or values.dtype.itemsize == 4
+        return typed_array(values, "f4" if single else "f8"), False
+    if allow_dates and values.dtype.kind in "MO":
+        try:
+            dates = pd.DatetimeIndex(values)
+        except (TypeError, ValueError):
+            return None
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        epoch_ms = dates.values.astype("datetime64[ms]").astype("int64")
+        return typed_array(epoch_ms, "f8"), True
+    return None
+
+
+def encode_figure(figure):
+    """Return a copy of a ``go.Figure`` as a dict with long arrays as typed arrays."""
+    figure = figure.to_plotly_json()
+    layout = dict(figure.get("layout", {}))
+    data = []
+    for trace in figure.get("data", []):
+        trace = dict(trace)
+        for key in ARRAY_KEYS:
+            encoded = _encode_values(
+                trace.get(key), allow_dates=key == "x", single=key in PRICE_KEYS
+            )
+            if encoded is None:
+                continue
+            trace[key], is_date = encoded
+            if is_date:
+                axis = "xaxis" + trace.get("xaxis", "x")[1:]
+                layout[axis] = {**layout.get(axis, {}), "type": "date"}
+        data.append(trace)
+    return {**figure, "data": data, "layout": layout}
+
+
+def figure_to_json(figure, binary=None):
+    """Serialize a ``go.Figure``, with typed arrays when ``binary`` is true,
+    by default when ``BINARY_FIGURES`` is on.
+    """
+    if binary is None:
+        binary = binary_figures_enabled()
+    if not binary:
+        return figure.to_json()
+    return json.dumps(encode_figure(figure), cls=PlotlyJSONEncoder, separators=(",", ":"))
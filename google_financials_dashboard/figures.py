@@ -0,0 +1,272 @@
+"""
+Figure builders for the financials dashboard.
+
+Building a ``go.Figure`` validates every trace property, which for a ten year
+candlestick costs far more than the data lookup itself. Figures are therefore
+built once per ``(figure, ticker, date range)`` and data version and kept as
+serialized JSON; later requests only parse that JSON back. The JSON is also
+put in the shared cache, so a figure one worker built is reused by the others.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from google_financials_dashboard.encoding import figure_to_json
+from google_financials_dashboard.indicators import (
+    PRESETS,
+    get_indicator,
+    indicator_cache,
+)
+from google_financials_dashboard.ohlc import visible_bars
+from google_financials_dashboard.price_history import PRICE_DECIMALS, prices
+from google_financials_dashboard.shared_cache import (
+    decode_figure,
+    encode_figure,
+    get_cache,
+)
+from jhonatan_projects.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 128
+
+# Figures of replaced data versions expire from the shared cache on their own.
+SHARED_TIMEOUT = 24 * 60 * 60
+
+
+class FigureCache:
+    """LRU of serialized figures, invalidated by the ticker's data version.
+
+    With ``shared`` on, figures missing from the LRU are looked up in the
+    shared cache before they are built.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, shared=True):
+        self.maxsize = maxsize
+        self.shared = shared
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        """Return the figure stored for ``key`` at ``version``, building it if needed."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] == version:
+                self._items.move_to_end(key)
+            else:
+                item = None
+        if item is None:
+            shared_key = self._shared_key(key, version)
+            figure_json = self._get_shared(shared_key)
+            if figure_json is None:
+                with stage("figure"):
+                    figure = build()
+                with stage("encode"):
+                    figure_json = figure_to_json(figure)
+                self._set_shared(shared_key, figure_json)
+            item = (version, figure_json)
+            with self._lock:
+                self._items[key] = item
+                self._items.move_to_end(key)
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+        with stage("encode"):
+            return json.loads(item[1])
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    @staticmethod
+    def _shared_key(key, version):
+        digest = hashlib.sha1(repr((key, version)).encode()).hexdigest()
+        return f"figure:{digest}"
+
+    def _get_shared(self, shared_key):
+        if not self.shared:
+            return None
+        try:
+            data = get_cache().get(shared_key)
+            return decode_figure(data) if data is not None else None
+        except Exception:
+            logger.exception(
+                "Could not read figure %s from the shared cache", shared_key
+            )
+            return None
+
+    def _set_shared(self, shared_key, figure_json):
+        if not self.shared:
+            return
+        try:
+            get_cache().set(shared_key, encode_figure(figure_json), SHARED_TIMEOUT)
+        except Exception:
+            logger.exception(
+                "Could not write figure %s to the shared cache", shared_key
+            )
+
+
+figure_cache = FigureCache()
+
+
+def _build_revenue_fcf(ticker_data):
+    result = ticker_data.facts.dropna(subset=["revenue"])
+    x = result.index
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            x=x,
+            y=result["revenue"],
+            marker_color="lightslategrey",
+            base=0,
+            name="Revenue",
+        )
+    )
+    fig.add_trace(
+        go.Bar(
+            x=x,
+            y=result["free_cash_flow"],
+            base=[-100000000],
+            marker_color="crimson",
+            name="Free Cash Flow",
+        )
+    )
+    fig.update_layout(
+        title="Values in Billions of Dollars",
+        margin=dict(t=26, b=0, l=40, r=0),
+        height=300,
+        legend=dict(
+            x=0.8,
+            y=1.12,
+            xanchor="center",
+            yanchor="top",  # Anchor the legend at the bottom on the y-axis
+            orientation="h",  # Horizontal orientation
+        ),
+    )
+    return fig
+
+
+# Height of the candlestick and of each indicator panel below it.
+CANDLESTICK_HEIGHT = 300
+PANEL_HEIGHT = 110
+
+# Y axis ranges of the panels that have a fixed scale.
+PANEL_RANGES = {"rsi": [0, 100]}
+
+
+def _indicator_traces(ticker_data, indicators, positions):
+    """Traces of the ``PRESETS`` named in ``indicators`` at the shown bars,
+    grouped by panel.
+    """
+    panels = {}
+    for preset in indicators:
+        name, params, _ = PRESETS[preset]
+        panel = get_indicator(name, params).panel
+        columns = indicator_cache.get(
+            ticker_data.ticker, ticker_data.history, name, params
+        )
+        for column, values in columns.items():
+            values = values[positions].round(PRICE_DECIMALS)
+            if column == "Histogram":
+                trace = go.Bar(y=values, name=column, marker_color="lightslategrey")
+            else:
+                trace = go.Scatter(
+                    y=values, name=column, mode="lines", line=dict(width=1)
+                )
+                if column == "BB lower":
+                    trace.update(fill="tonexty", fillcolor="rgba(100, 100, 180, 0.1)")
+            panels.setdefault(panel, []).append(trace)
+    return panels
+
+
+def _build_candlestick(ticker_data, start, end, indicators=()):
+    data, positions = visible_bars(ticker_data.history, start, end)
+    fig = go.Figure(
+        data=[
+            go.Candlestick(
+                x=data["Date"],
+                open=prices(data["Open"]),
+                high=prices(data["High"]),
+                low=prices(data["Low"]),
+                close=prices(data["Close"]),
+                name="OHLC",
+                showlegend=False,
+            )
+        ]
+    )
+    panels = _indicator_traces(ticker_data, indicators, positions)
+    lower = [panel for panel in panels if panel != "price"]
+    height = CANDLESTICK_HEIGHT + PANEL_HEIGHT * len(lower)
+    # Lower panels stack from the bottom up, the candlestick takes the rest.
+    bottom = 0.0
+    for number, panel in enumerate(reversed(lower), start=2):
+        top = bottom + PANEL_HEIGHT / height
+        fig.update_layout(
+            {
+                f"yaxis{number}": dict(
+                    domain=[bottom, top - 0.02],
+                    range=PANEL_RANGES.get(panel),
+                    side="right",
+                )
+            }
+        )
+        for trace in panels[panel]:
+            fig.add_trace(trace.update(x=data["Date"], yaxis=f"y{number}"))
+        bottom = top
+    for trace in panels.get("price", []):
+        fig.add_trace(trace.update(x=data["Date"]))
+    fig.update_layout(
+        title="Values in Dollars", margin=dict(t=26, b=0, l=0, r=40), height=height
+    )
+    if panels:
+        fig.update_layout(
+            yaxis=dict(domain=[bottom, 1]),
+            # The range slider would sit between the candlestick and the panels.
+            xaxis_rangeslider_visible=not lower,
+            legend=dict(x=0, y=1, orientation="h", bgcolor="rgba(255,255,255,0.6)"),
+        )
+    return fig
+
+
+def unavailable_figure(message, height=CANDLESTICK_HEIGHT):
+    """Empty figure showing ``message``, for data that could not be loaded."""
+    fig = go.Figure()
+    fig.update_layout(
+        height=height,
+        margin=dict(t=26, b=0, l=0, r=0),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        annotations=[
+            dict(text=message, showarrow=False, xref="paper", yref="paper")
+        ],
+    )
+    return fig
+
+
+def revenue_fcf_figure(ticker_data):
+    """Yearly revenue and free cash flow bars as a figure dict."""
+    return figure_cache.get_or_build(
+        ("revenue_fcf", ticker_data.ticker, None),
+        ticker_data.version,
+        lambda: _build_revenue_fcf(ticker_data),
+    )
+
+
+def candlestick_figure(ticker_data, start=None, end=None, indicators=()):
+    """OHLC candlestick between ``start`` and ``end`` as a figure dict.
+
+    Bars are aggregated to the finest resolution that keeps the number of
+    points bounded, see :func:`google_financials_dashboard.ohlc.visible_range`.
+    ``indicators`` names the :data:`~google_financials_dashboard.indicators.PRESETS`
+    to draw, sampled at the last bar aggregated into each shown bar.
+    """
+    indicators = tuple(p for p in PRESETS if p in indicators)
+    return figure_cache.get_or_build(
+        ("candle_stick", ticker_data.ticker, (start, end), indicators),
+        ticker_data.version,
+        lambda: _build_candlestick(ticker_data, start, end, indicators),
+    )
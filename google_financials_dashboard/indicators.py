@@ -0,0 +1,323 @@
+"""
+Technical indicators for the candlestick chart.
+
+Indicators are computed over the closes of a ticker's whole price history with
+vectorized NumPy and pandas, once per ``(ticker, indicator, params)``. Each one
+carries the state it needs to continue: the last closes of its rolling window,
+or the last value of its exponential averages. When the price store appends
+bars, :class:`IndicatorCache` only computes the new bars from that state
+instead of the whole series again. A history that no longer starts with the
+bars computed before, e.g. after upstream re-adjusted it, is computed again.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_CACHE_SIZE = 256
+
+
+def _closes(history, start=0):
+    """Closes of ``history`` from bar ``start`` on, as float64."""
+    return history.columns["Close"][start:].astype(np.float64)
+
+
+def _rolling(values, window, tail):
+    """Windows of ``window`` values ending at each of ``values``.
+
+    ``tail`` holds the values before them, windows reaching further back are
+    all NaN.
+    """
+    pad = np.full(max(window - 1 - len(tail), 0), np.nan)
+    windows = sliding_window_view(np.concatenate([pad, tail, values]), window)
+    return windows[len(windows) - len(values) :]
+
+
+def _tail(tail, values, window):
+    """The last ``window - 1`` of ``tail`` followed by ``values``."""
+    keep = window - 1
+    return np.concatenate([tail, values])[-keep:] if keep else np.empty(0)
+
+
+def _ewm(values, alpha, last=None):
+    """Exponentially weighted mean of ``values`` (``adjust=False``), continuing
+    from the previous mean ``last``.
+    """
+    if last is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    series = pd.Series(np.concatenate([[last], values]))
+    return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _span_alpha(span):
+    return 2 / (span + 1)
+
+
+class Indicator:
+    """A series computed from closes, extendable with new bars.
+
+    ``panel`` is where the chart draws it: ``"price"`` overlays the candles,
+    other panels get their own y axis below them.
+    """
+
+    name = None
+    panel = "price"
+
+    def __init__(self, *params):
+        self.params = params
+
+    def compute(self, closes):
+        """``(columns, state)`` for a whole series of closes."""
+        return self.extend(self.initial_state(), closes)
+
+    def initial_state(self):
+        raise NotImplementedError
+
+    def extend(self, state, closes):
+        """``(columns, state)`` for ``closes`` following the bars of ``state``."""
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    name = "sma"
+
+    def __init__(self, window=20):
+        super().__init__(window)
+        self.window = window
+
+    def initial_state(self):
+        return {"tail": np.empty(0)}
+
+    def extend(self, state, closes):
+        windows = _rolling(closes, self.window, state["tail"])
+        tail = _tail(state["tail"], closes, self.window)
+        return {f"SMA {self.window}": windows.mean(axis=1)}, {"tail": tail}
+
+
+class EMA(Indicator):
+    name = "ema"
+
+    def __init__(self, span=20):
+        super().__init__(span)
+        self.span = span
+
+    def initial_state(self):
+        return {"last": None}
+
+    def extend(self, state, closes):
+        values = _ewm(closes, _span_alpha(self.span), state["last"])
+        last = values[-1] if len(values) else state["last"]
+        return {f"EMA {self.span}": values}, {"last": last}
+
+
+class Bollinger(Indicator):
+    """Simple moving average with bands ``width`` standard deviations away."""
+
+    name = "bollinger"
+
+    def __init__(self, window=20, width=2.0):
+        super().__init__(window, width)
+        self.window = window
+        self.width = width
+
+    def initial_state(self):
+        return {"tail": np.empty(0)}
+
+    def extend(self, state, closes):
+        windows = _rolling(closes, self.window, state["tail"])
+        middle = windows.mean(axis=1)
+        deviation = self.width * windows.std(axis=1)
+        tail = _tail(state["tail"], closes, self.window)
+        # The chart fills between consecutive traces, upper to lower.
+        columns = {
+            "BB upper": middle + deviation,
+            "BB lower": middle - deviation,
+            "BB middle": middle,
+        }
+        return columns, {"tail": tail}
+
+
+class RSI(Indicator):
+    """Wilder's relative strength index, NaN for the first ``period`` bars."""
+
+    name = "rsi"
+    panel = "rsi"
+
+    def __init__(self, period=14):
+        super().__init__(period)
+        self.period = period
+
+    def initial_state(self):
+        return {"close": None, "gain": None, "loss": None, "count": 0}
+
+    def extend(self, state, closes):
+        if not len(closes):
+            return {f"RSI {self.period}": np.empty(0)}, state
+        previous = [] if state["close"] is None else [state["close"]]
+        change = np.diff(np.concatenate([previous, closes]))
+        alpha = 1 / self.period
+        gain = _ewm(np.maximum(change, 0), alpha, state["gain"])
+        loss = _ewm(np.maximum(-change, 0), alpha, state["loss"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        if not previous:
+            # The first close has no change.
+            rsi = np.concatenate([[np.nan], rsi])
+        count = state["count"] + len(closes)
+        rsi[np.arange(state["count"], count) < self.period] = np.nan
+        new_state = {
+            "close": closes[-1],
+            "gain": gain[-1] if len(gain) else None,
+            "loss": loss[-1] if len(loss) else None,
+            "count": count,
+        }
+        return {f"RSI {self.period}": rsi}, new_state
+
+
+class MACD(Indicator):
+    name = "macd"
+    panel = "macd"
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__(fast, slow, signal)
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+
+    def initial_state(self):
+        return {"fast": None, "slow": None, "signal": None}
+
+    def extend(self, state, closes):
+        if not len(closes):
+            empty = np.empty(0)
+            return {"MACD": empty, "Signal": empty, "Histogram": empty}, state
+        fast = _ewm(closes, _span_alpha(self.fast), state["fast"])
+        slow = _ewm(closes, _span_alpha(self.slow), state["slow"])
+        macd = fast - slow
+        signal = _ewm(macd, _span_alpha(self.signal), state["signal"])
+        columns = {"MACD": macd, "Signal": signal, "Histogram": macd - signal}
+        return columns, {"fast": fast[-1], "slow": slow[-1], "signal": signal[-1]}
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, Bollinger, RSI, MACD)}
+
+# Overlays offered by the dashboard: option value -> (indicator, params, label).
+PRESETS = {
+    "sma20": ("sma", (20,), "SMA 20"),
+    "sma50": ("sma", (50,), "SMA 50"),
+    "ema20": ("ema", (20,), "EMA 20"),
+    "bollinger": ("bollinger", (20, 2.0), "Bollinger 20, 2"),
+    "rsi": ("rsi", (14,), "RSI 14"),
+    "macd": ("macd", (12, 26, 9), "MACD 12, 26, 9"),
+}
+
+
+def get_indicator(name, params=()):
+    try:
+        return INDICATORS[name](*params)
+    except KeyError:
+        raise ValueError(f"unknown indicator {name!r}") from None
+
+
+def _append(buffers, length, new, n):
+    """``buffers`` holding their first ``length`` rows followed by ``new``, ``n`` rows.
+
+    The rows are written in place when ``buffers`` has room and nothing was
+    written past ``length`` yet, so appending a bar costs one row per column.
+    Otherwise the columns are copied into new buffers with room for ``n`` more
+    rows, which keeps the copies amortized O(1) per bar.
+    """
+    if buffers["filled"] == length and buffers["capacity"] >= n:
+        for column, values in new.items():
+            buffers["columns"][column][length:n] = values
+        buffers["filled"] = n
+        return buffers
+    columns = {}
+    for column, values in buffers["columns"].items():
+        buffer = np.empty(2 * n, dtype=np.result_type(values, new[column]))
+        buffer[:length] = values[:length]
+        buffer[length:n] = new[column]
+        columns[column] = buffer
+    return {"filled": n, "capacity": 2 * n, "columns": columns}
+
+
+class IndicatorCache:
+    """LRU of indicator columns per ``(ticker, indicator, params)``.
+
+    An entry remembers how many bars it covers, their first and last date and
+    the last close. A longer history that still has those at the same positions
+    is taken to be the same history with bars appended, and only those are
+    computed and written after the others in growable buffers, see
+    :func:`_append`. The columns returned are views of the first ``len(history)``
+    rows, which later appends never change.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.full = 0
+        self.incremental = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ticker, history, name, params=()):
+        """Columns of indicator ``name`` over every bar of ``history``."""
+        indicator = get_indicator(name, params)
+        key = (ticker, indicator.name, indicator.params)
+        n = len(history)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+        if (
+            entry is not None
+            and entry["length"] <= n
+            and self._continues(entry, history)
+        ):
+            if entry["length"] == n:
+                return entry["columns"]
+            closes = _closes(history, entry["length"])
+            new, state = indicator.extend(entry["state"], closes)
+            # Under the lock, so two extensions never write the same rows.
+            with self._lock:
+                buffers = _append(entry["buffers"], entry["length"], new, n)
+            self.incremental += 1
+        else:
+            columns, state = indicator.compute(_closes(history))
+            buffers = {"filled": n, "capacity": n, "columns": columns}
+            self.full += 1
+        columns = {column: values[:n] for column, values in buffers["columns"].items()}
+        entry = {
+            "length": n,
+            "bounds": self._bounds(history, n - 1) if n else None,
+            "buffers": buffers,
+            "columns": columns,
+            "state": state,
+        }
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return columns
+
+    @staticmethod
+    def _bounds(history, last):
+        """First date, date of bar ``last`` and its close."""
+        first, last_date = history.dates(np.array([0, last]))
+        return first, last_date, history.columns["Close"][last]
+
+    def _continues(self, entry, history):
+        """Whether ``history`` starts with the bars ``entry`` was computed on."""
+        if entry["bounds"] is None:
+            return True
+        return self._bounds(history, entry["length"] - 1) == entry["bounds"]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+indicator_cache = IndicatorCache()
@@ -0,0 +1,81 @@
+"""
+Key facts engine for the financials dashboard.
+
+The income statement and cash flow are joined and indexed by fiscal year once;
+growth rates and ratios are then computed for every year in a single vectorized
+pass. Frames indexed by ``(ticker, year)`` are handled the same way, so a whole
+universe of tickers can be processed in one call.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {
+    "Total Revenue": "revenue",
+    "Cost Of Revenue": "cost_of_revenue",
+    "Free Cash Flow": "free_cash_flow",
+}
+
+# name -> (numerator, denominator), evaluated column-wise for every year.
+RATIOS = {
+    "gross_margin": ("gross_profit", "revenue"),
+    "fcf_margin": ("free_cash_flow", "revenue"),
+}
+
+CAGR_YEARS = (3,)
+
+
+def statements_by_year(financials, cashflow):
+    """Join the yearly statements into one frame indexed by fiscal year.
+
+    Missing years inside the covered range are kept as ``NaN`` rows so that
+    year-over-year shifts always compare the right fiscal years. Line items a
+    ticker does not report at all, like the cost of revenue of a bank, are
+    ``NaN`` columns.
+    """
+    joined = financials.join(cashflow).reindex(columns=list(COLUMNS))
+    values = joined.to_numpy(dtype="float64")
+    missing = np.isnan(values)
+    # A year is kept when it has every line item the ticker reports.
+    reported = ~missing.all(axis=0)
+    keep = reported.any() & ~missing[:, reported].any(axis=1)
+    years = pd.Index(pd.DatetimeIndex(joined.index).year[keep], name="year")
+    frame = pd.DataFrame(values[keep], index=years, columns=list(COLUMNS.values()))
+    frame = frame[~frame.index.duplicated()].sort_index()
+    if frame.empty:
+        return frame
+    return frame.reindex(
+        pd.RangeIndex(frame.index.min(), frame.index.max() + 1, name="year")
+    )
+
+
+def _shift(series, periods):
+    if isinstance(series.index, pd.MultiIndex):
+        return series.groupby(level="ticker").shift(periods)
+    return series.shift(periods)
+
+
+def compute_key_facts(statements, ratios=RATIOS, cagr_years=CAGR_YEARS):
+    """Return ``statements`` extended with growth rates and ``ratios`` per year."""
+    facts = statements.copy()
+    revenue = facts["revenue"]
+    facts["gross_profit"] = revenue - facts["cost_of_revenue"]
+    for name, (numerator, denominator) in ratios.items():
+        facts[name] = facts[numerator] / facts[denominator]
+    facts["revenue_growth"] = revenue / _shift(revenue, 1) - 1
+    for years in cagr_years:
+        facts[f"revenue_cagr_{years}y"] = (revenue / _shift(revenue, years)) ** (
+            1 / years
+        ) - 1
+    return facts
+
+
+def batch_key_facts(statements, **kwargs):
+    """Compute key facts for a ``{ticker: statements_by_year(...)}`` mapping."""
+    frame = pd.concat(statements, names=["ticker", "year"])
+    return compute_key_facts(frame, **kwargs)
+
+
+def latest(facts):
+    """Key facts of the most recent year with reported revenue."""
+    return facts.dropna(subset=["revenue"]).iloc[-1]
@@ -0,0 +1,107 @@
+"""
+Serialized Dash layout of the dashboard, cached per data version.
+
+django_plotly_dash answers every ``_dash-layout`` request by serializing the
+whole component tree to JSON, parsing it back to apply initial arguments and
+serializing it again. The layout only changes with the default ticker's data
+version (its figures and key facts are pre-rendered into it), so the response
+body is built once per version, compressed with gzip and brotli right away,
+and later requests get those bytes as they are, or a ``304 Not Modified`` when
+the browser's ``ETag`` still matches.
+"""
+
+import gzip
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 11
+
+_ENCODINGS = ("br", "gzip")
+
+
+def compress(body):
+    """Compressed variants of ``body`` keyed by content coding."""
+    variants = {"gzip": gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return {coding: data for coding, data in variants.items() if len(data) < len(body)}
+
+
+class LayoutEntry:
+    """Layout body of one data version with its compressed variants."""
+
+    def __init__(self, version, body, content_type):
+        self.version = version
+        self.body = body
+        self.content_type = content_type
+        self.digest = hashlib.sha1(body).hexdigest()
+        self.variants = compress(body)
+
+    def encoding(self, accept_encoding):
+        """Best content coding of the ``Accept-Encoding`` header, or ``None``."""
+        accepted = set()
+        for part in accept_encoding.split(","):
+            coding, _, params = part.partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+                continue
+            accepted.add(coding.strip().lower())
+        for coding in _ENCODINGS:
+            if coding in self.variants and (coding in accepted or "*" in accepted):
+                return coding
+        return None
+
+    def response(self, request):
+        coding = self.encoding(request.headers.get("Accept-Encoding", ""))
+        # Each coding is a different representation and gets its own tag.
+        etag = f'"{self.digest}-{coding}"' if coding else f'"{self.digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                self.variants[coding] if coding else self.body,
+                content_type=self.content_type,
+            )
+            if coding:
+                response["Content-Encoding"] = coding
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept-Encoding"])
+        # The browser always revalidates, an unchanged layout answers 304.
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+        return response
+
+
+class LayoutCache:
+    """The layout entry of the current data version."""
+
+    def __init__(self):
+        self._entry = None
+
+    def get(self, version):
+        entry = self._entry
+        return entry if entry is not None and entry.version == version else None
+
+    def set(self, version, response):
+        """Store the layout ``response`` rendered for ``version``."""
+        self._entry = LayoutEntry(version, response.content, response["Content-Type"])
+        return self._entry
+
+    def clear(self):
+        self._entry = None
+
+
+_cache = LayoutCache()
+
+
+def get_layout_cache():
+    return _cache
@@ -0,0 +1,173 @@
+"""
+Simulated intraday session streamed to the candlestick in live mode.
+
+There is no real-time feed behind the dashboard, so live mode replays a
+synthetic regular session: one-minute bars that random-walk away from the
+ticker's last close, with every simulated minute lasting
+``FINANCIALS_DASHBOARD["LIVE_INTERVAL"]`` seconds of wall time. The session and
+how far it has progressed only depend on the ticker, its last close and the
+clock, so every server process agrees on the bars without sharing state; once
+the session is over the next one starts.
+
+The dashboard renders the bars published so far once, then
+:class:`~google_financials_dashboard.consumers.LiveBarsConsumer` pushes only
+the bars that close afterwards over a websocket, and the browser appends them to
+the figure with ``extendData`` instead of re-rendering it. Where websockets are
+not available, App Engine standard for one, the browser polls the same messages
+from :func:`~google_financials_dashboard.views.live_bars` once per simulated
+minute instead.
+"""
+
+import asyncio
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from django.conf import settings
+
+from google_financials_dashboard.providers import SESSION_MINUTES, SESSION_OPEN
+
+DEFAULT_INTERVAL = 1.0
+
+# Route of LiveBarsConsumer, see google_financials_dashboard/routing.py.
+WS_PATH = "ws/google_financials_dashboard/live/<str:ticker>/"
+
+# Route of the polling fallback, see jhonatan_projects/urls.py.
+POLL_PATH = "google_financials_dashboard_project/live/<str:ticker>/"
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def live_interval():
+    """Wall time in seconds of one simulated minute."""
+    return float(
+        getattr(settings, "FINANCIALS_DASHBOARD", {}).get(
+            "LIVE_INTERVAL", DEFAULT_INTERVAL
+        )
+    )
+
+
+def clock(interval=None, now=None):
+    """``(session, published)``: the current session number and its closed bars."""
+    interval = interval or live_interval()
+    now = time.time() if now is None else now
+    session, elapsed = divmod(now, interval * SESSION_MINUTES)
+    return int(session), int(elapsed // interval) + 1
+
+
+@lru_cache(maxsize=32)
+def session_bars(ticker, session, last_close, interval):
+    """All one-minute bars of simulated ``session`` of ``ticker``."""
+    rng = np.random.default_rng([zlib.crc32(ticker.encode()), session])
+    sigma = 0.3 / np.sqrt(252 * SESSION_MINUTES)
+    steps = rng.standard_normal((SESSION_MINUTES, 4))
+    close = last_close * np.exp(np.cumsum(sigma * steps[:, 0]))
+    open_ = np.empty(SESSION_MINUTES)
+    open_[0] = last_close
+    open_[1:] = close[:-1]
+    wick = sigma * np.abs(steps[:, 1:3])
+    day = pd.Timestamp(session * interval * SESSION_MINUTES, unit="s").normalize()
+    dates = day + SESSION_OPEN + pd.to_timedelta(np.arange(SESSION_MINUTES), "min")
+    return pd.DataFrame(
+        {
+            "Date": dates.strftime(DATE_FORMAT),
+            "Open": open_.round(4),
+            "High": (np.maximum(open_, close) * (1 + wick[:, 0])).round(4),
+            "Low": (np.minimum(open_, close) * (1 - wick[:, 1])).round(4),
+            "Close": close.round(4),
+        }
+    )
+
+
+def last_close(ticker_data):
+    close = ticker_data.history.last_close()
+    return 100.0 if close is None else close
+
+
+def bar_payload(bars):
+    """Columns of ``bars`` keyed by the candlestick trace attribute they extend."""
+    return {
+        "x": bars["Date"].tolist(),
+        "open": bars["Open"].tolist(),
+        "high": bars["High"].tolist(),
+        "low": bars["Low"].tolist(),
+        "close": bars["Close"].tolist(),
+    }
+
+
+def live_figure(ticker_data):
+    """Candlestick of the current session's bars so far.
+
+    ``layout.meta.live`` tells the browser which websocket to open, or which
+    URL to poll without one, and from which bar the updates continue.
+    """
+    interval = live_interval()
+    session, published = clock(interval)
+    close = last_close(ticker_data)
+    bars = session_bars(ticker_data.ticker, session, close, interval)[:published]
+    path = WS_PATH.replace("<str:ticker>", ticker_data.ticker)
+    poll_path = POLL_PATH.replace("<str:ticker>", ticker_data.ticker)
+    fig = go.Figure(
+        data=[
+            go.Candlestick(
+                x=bars["Date"],
+                open=bars["Open"],
+                high=bars["High"],
+                low=bars["Low"],
+                close=bars["Close"],
+            )
+        ]
+    )
+    fig.update_layout(
+        title="Intraday, simulated live session",
+        margin=dict(t=26, b=0, l=0, r=40),
+        height=300,
+        xaxis_rangeslider_visible=False,
+        meta={
+            "live": {
+                "url": f"/{path}?session={session}&count={published}",
+                "poll_url": f"/{poll_path}",
+                "session": session,
+                "count": published,
+                "interval_ms": round(interval * 1000),
+                "max_points": SESSION_MINUTES,
+            }
+        },
+    )
+    return fig
+
+
+def next_message(ticker, close, session, count, interval=None):
+    """Update for a browser showing the first ``count`` bars of ``session``.
+
+    The bars closed since, a ``reset`` once a new session has started, or
+    ``None`` when there is nothing new yet.
+    """
+    interval = interval or live_interval()
+    current, published = clock(interval)
+    if current != session:
+        return {"type": "reset", "session": current}
+    if published > count:
+        bars = session_bars(ticker, session, close, interval)[count:published]
+        return {"type": "bars", "bars": bar_payload(bars)}
+    return None
+
+
+async def updates(ticker, close, session, count):
+    """Yield the bars of ``session`` that close after the first ``count``.
+
+    Ends with a ``reset`` message once a new session has started, the browser
+    then renders that session and reconnects.
+    """
+    interval = live_interval()
+    while True:
+        message = next_message(ticker, close, session, count, interval)
+        if message is not None:
+            yield message
+            if message["type"] == "reset":
+                return
+            count += len(message["bars"]["x"])
+        await asyncio.sleep(interval - time.time() % interval + 0.01)
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from google_financials_dashboard.benchmarks import (
+    DEFAULT_ROUNDS,
+    DEFAULT_SIZES,
+    REPORTS,
+    compare,
+    run_benchmarks,
+)
+
+BASELINE = Path(__file__).resolve().parents[2] / "benchmark_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time each stage of the dashboard pipeline (data load, statement merge, "
+        "key facts, figure build, serialization as JSON and as typed arrays, Dash "
+        "callback) on synthetic data of several sizes and fail if it regressed "
+        "against the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=list(DEFAULT_SIZES),
+            help="years of price history and statements",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=DEFAULT_ROUNDS,
+            help="runs of the whole benchmark, stages are judged on their median",
+        )
+        parser.add_argument("--frequency", choices=["1d", "1min"], default="1d")
+        parser.add_argument("--baseline", default=str(BASELINE))
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.3,
+            help="allowed growth of the calibrated median and peak memory",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="store these results as the new baseline instead of comparing",
+        )
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(
+            options["sizes"], options["repeat"], options["frequency"], options["rounds"]
+        )
+        self.stdout.write(
+            f"{'size':<6}{'stage':<18}{'min ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'relative':>10}{'peak KB':>11}"
+        )
+        for size, stages in results.items():
+            if size in REPORTS:
+                continue
+            for stage, r in stages.items():
+                self.stdout.write(
+                    f"{size:<6}{stage:<18}{r['min']:>10.2f}{r['p50']:>10.2f}"
+                    f"{r['p95']:>10.2f}{r['relative']:>10.2f}"
+                    f"{r['peak_kb']:>11.0f}"
+                )
+
+        self.stdout.write(
+            f"calibration workload {results['calibration']['p50']:.2f} ms"
+        )
+        self.stdout.write(
+            f"\n{'size':<6}{'frame KB':>10}{'compact KB':>12}{'ratio':>7}"
+            f"{'mmap KB':>9}{'mapped KB':>11}"
+        )
+        for size, m in results["history_memory"].items():
+            self.stdout.write(
+                f"{size:<6}{m['frame_kb']:>10.0f}{m['compact_kb']:>12.0f}"
+                f"{m['frame_kb'] / m['compact_kb']:>6.1f}x"
+                f"{m['mmap_kb']:>9.1f}{m['mapped_kb']:>11.0f}"
+            )
+        self.stdout.write(f"\n{'size':<6}{'JSON KB':>10}{'typed KB':>10}{'ratio':>7}")
+        for size, p in results["payload"].items():
+            self.stdout.write(
+                f"{size:<6}{p['json_kb']:>10.0f}{p['binary_kb']:>10.0f}"
+                f"{p['json_kb'] / p['binary_kb']:>6.1f}x"
+            )
+
+        path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline = json.loads(path.read_text()) if path.exists() else {}
+            baseline.update(results)
+            path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"Baseline saved to {path}")
+            return
+        if not path.exists():
+            self.stdout.write(f"No baseline at {path}, nothing to compare")
+            return
+        regressions = compare(
+            results, json.loads(path.read_text()), options["tolerance"]
+        )
+        if regressions:
+            raise CommandError("Regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions"))
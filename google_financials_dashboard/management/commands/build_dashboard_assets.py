@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from google_financials_dashboard import assets
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the dashboard's self-hosted Tailwind CSS and Font Awesome subset "
+        "from the classes used in the Dash layout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=str(assets.OUTPUT_DIR), help="directory to write to"
+        )
+
+    def handle(self, *args, **options):
+        from google_financials_dashboard.dash_apps.dash_app import base_layout
+
+        executable = assets.tailwind_executable()
+        if executable is None:
+            raise CommandError(
+                "Tailwind CLI not found, install it with `pip install tailwindcss-bin`"
+            )
+        try:
+            import fontawesomefree  # noqa: F401
+            import fontTools  # noqa: F401
+        except ImportError as exc:
+            raise CommandError(
+                f"{exc.name} is missing, install the build tools with "
+                "`pip install fontawesomefree fonttools brotli`"
+            )
+
+        output = Path(options["output"])
+        output.mkdir(parents=True, exist_ok=True)
+        classes = assets.layout_classes(base_layout)
+        assets.build_tailwind(classes, output / "tailwind.css", executable)
+        codepoints = assets.build_icons(classes, output)
+
+        for path in sorted(p for p in output.rglob("*") if p.is_file()):
+            self.stdout.write(
+                f"{path.relative_to(output)}: {path.stat().st_size / 1024:.1f} KB"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(classes)} classes, {len(codepoints)} icons")
+        )
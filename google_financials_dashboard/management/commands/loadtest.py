@@ -0,0 +1,92 @@
+import json
+import statistics
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from google_financials_dashboard.dash_apps.dash_app import PLOT_OUTPUTS
+
+DASH_APP = "/django_plotly_dash/app/google_dashboard"
+
+
+def plot_callback_body(ticker):
+    """Request body the browser sends for the KPI/revenue ``plot`` callback."""
+    return {
+        "output": "..%s.." % "...".join(f"{i}.{p}" for i, p in PLOT_OUTPUTS),
+        "outputs": [{"id": i, "property": p} for i, p in PLOT_OUTPUTS],
+        "inputs": [{"id": "ticker", "property": "value", "value": ticker}],
+        "changedPropIds": ["ticker.value"],
+        "state": [],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a running server with concurrent requests against the dashboard "
+        "page, its Dash layout and its plot callback, and report requests/sec."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+        parser.add_argument("--ticker", default="GOOGL")
+
+    def handle(self, *args, **options):
+        base = options["base_url"].rstrip("/")
+        targets = [
+            ("page", "GET", f"{base}/google_financials_dashboard_project/", None),
+            ("layout", "GET", f"{base}{DASH_APP}/_dash-layout", None),
+            (
+                "callback",
+                "POST",
+                f"{base}{DASH_APP}/_dash-update-component",
+                json.dumps(plot_callback_body(options["ticker"])),
+            ),
+        ]
+        for name, method, url, body in targets:
+            latencies, errors, elapsed = self._run(
+                method, url, body, options["concurrency"], options["duration"]
+            )
+            if not latencies:
+                self.stdout.write(f"{name:<9} no successful requests ({errors} errors)")
+                continue
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"{name:<9} {len(latencies) / elapsed:8.1f} req/s  "
+                f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                f"p95 {p95 * 1000:7.1f} ms  errors {errors}"
+            )
+
+    def _run(self, method, url, body, concurrency, duration):
+        latencies, lock = [], threading.Lock()
+        errors = [0]
+        deadline = time.perf_counter() + duration
+        headers = {"Content-Type": "application/json"} if body else {}
+
+        def worker():
+            session = requests.Session()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = session.request(method, url, data=body, headers=headers)
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                took = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(took)
+                    else:
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors[0], time.perf_counter() - started
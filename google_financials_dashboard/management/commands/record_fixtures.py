@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from google_financials_dashboard.market_data import (
+    DATASETS,
+    MarketDataUnavailable,
+    get_service,
+)
+from google_financials_dashboard.tickers import available_tickers, normalize_ticker
+
+
+class Command(BaseCommand):
+    help = (
+        "Record the market data of some tickers as fixture files that "
+        "FixtureProvider replays offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument(
+            "tickers", nargs="*", help="defaults to MARKET_DATA['TICKERS']"
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"])
+        service = get_service()
+        service.background = False
+        for ticker in options["tickers"] or available_tickers():
+            try:
+                ticker = normalize_ticker(ticker)
+                datasets = {
+                    name: service.get(ticker, name) for name in (*DATASETS, "estimates")
+                }
+            except (ValueError, MarketDataUnavailable) as exc:
+                raise CommandError(f"{ticker}: {exc}")
+            target = directory / ticker
+            target.mkdir(parents=True, exist_ok=True)
+            datasets["history"].frame().to_parquet(
+                target / "history.parquet", index=False
+            )
+            datasets["financials"].to_parquet(target / "financials.parquet")
+            datasets["cashflow"].to_parquet(target / "cashflow.parquet")
+            for name in ("info", "estimates"):
+                (target / f"{name}.json").write_text(
+                    json.dumps(datasets[name], default=str), encoding="utf-8"
+                )
+            self.stdout.write(f"{ticker}: {len(datasets['history'])} bars recorded")
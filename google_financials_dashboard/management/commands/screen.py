@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from google_financials_dashboard.screener import COLUMNS, save_result, screen
+from google_financials_dashboard.tickers import available_tickers, normalize_ticker
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute revenue CAGR, margins and fair value for a universe of tickers "
+        "and print them as a table sorted by one of the columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "tickers", nargs="*", help="defaults to MARKET_DATA['TICKERS']"
+        )
+        parser.add_argument("--file", help="file with one ticker per line")
+        parser.add_argument("--workers", type=int, default=8, help="fetch threads")
+        parser.add_argument(
+            "--processes", type=int, default=None, help="compute processes"
+        )
+        parser.add_argument("--sort", default="fair_value", choices=COLUMNS)
+        parser.add_argument("--ascending", action="store_true")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--csv", help="also write the table to this file")
+        parser.add_argument(
+            "--save", action="store_true", help="serve this run from the screener API"
+        )
+
+    def handle(self, *args, **options):
+        tickers = list(options["tickers"])
+        if options["file"]:
+            lines = Path(options["file"]).read_text().split()
+            tickers += [line for line in lines if not line.startswith("#")]
+        try:
+            tickers = list(dict.fromkeys(map(normalize_ticker, tickers)))
+        except ValueError as exc:
+            raise CommandError(exc)
+        tickers = tickers or available_tickers()
+
+        table, errors = screen(tickers, options["workers"], options["processes"])
+        table = table.sort_values(
+            options["sort"], ascending=options["ascending"], ignore_index=True
+        )
+        if options["save"]:
+            save_result(table)
+        if options["csv"]:
+            table.to_csv(options["csv"], index=False)
+        shown = table.head(options["limit"]) if options["limit"] else table
+        self.stdout.write(shown.to_string(index=False, float_format="{:.4g}".format))
+        for ticker, error in sorted(errors.items()):
+            self.stderr.write(f"{ticker}: {error}")
+        self.stdout.write(f"{len(table)} screened, {len(errors)} failed")
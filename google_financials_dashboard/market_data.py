@@ -0,0 +1,377 @@
+"""
+Market data service for the financials dashboard.
+
+Every dataset (price history, income statement, cash flow, ticker info and
+analyst estimates) is fetched lazily from the configured provider on first
+use, kept in memory and saved to the cache shared by all server processes, see
+:mod:`google_financials_dashboard.shared_cache`, so each dataset is fetched
+once and not once per worker. Entries older than ``TTL`` seconds are still
+served while a background thread refreshes them, and the last good copy keeps
+being served when the provider is unreachable. Only the datasets of the
+``MAX_TICKERS`` most recently used tickers are kept in memory and refreshed;
+older ones are read back from the shared cache when requested again.
+"""
+
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from google_financials_dashboard.price_history import PriceHistory
+from google_financials_dashboard.price_store import HISTORY_YEARS, PriceStore
+from google_financials_dashboard.providers import get_provider
+from google_financials_dashboard.shared_cache import (
+    DEFAULT_ALIAS,
+    decode,
+    encode,
+    fetch_once,
+)
+
+logger = logging.getLogger(__name__)
+
+DATASETS = ("history", "financials", "cashflow", "info")
+
+DEFAULTS = {
+    "CACHE_DIR": os.path.join(tempfile.gettempdir(), "market_data"),
+    "TTL": 24 * 60 * 60,
+    "REFRESH_INTERVAL": 15 * 60,
+    "PROVIDER": None,
+    "HISTORY_YEARS": HISTORY_YEARS,
+    # Threads for blocking upstream calls made from async code.
+    "FETCH_WORKERS": 32,
+    # Alias in settings.CACHES shared by the server processes.
+    "CACHE": DEFAULT_ALIAS,
+    # Memory-map price histories from CACHE_DIR, sharing them between workers.
+    "MMAP_HISTORY": False,
+    # Tickers whose datasets are kept in memory and refreshed in the background.
+    "MAX_TICKERS": 64,
+}
+
+
+class MarketDataUnavailable(Exception):
+    """Raised when a dataset is neither cached nor fetchable from upstream."""
+
+
+def _is_empty(value):
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    return not value
+
+
+class MarketDataService:
+    """Lazy, shared-cache-backed, background-refreshed access to per-ticker datasets."""
+
+    def __init__(
+        self,
+        cache_dir,
+        ttl,
+        refresh_interval,
+        provider,
+        history_years=HISTORY_YEARS,
+        fetch_workers=DEFAULTS["FETCH_WORKERS"],
+        cache_alias=DEFAULT_ALIAS,
+        mmap_history=False,
+        max_tickers=DEFAULTS["MAX_TICKERS"],
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.provider = provider
+        self.cache_alias = cache_alias
+        self.mmap_history = mmap_history
+        self.max_tickers = max_tickers
+        # Price history is persisted incrementally by the PriceStore, the
+        # remaining datasets are small and simply re-fetched as a whole.
+        self.prices = PriceStore(
+            self.cache_dir / "prices", provider.history, history_years
+        )
+        self._entries = {}
+        # Tickers of _entries, least recently used first.
+        self._tickers = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+        self.fetch_workers = fetch_workers
+        # Created on first use by each process, threads do not survive a fork.
+        self._executor = None
+        self._executor_pid = None
+        self.background = True
+
+    def get(self, ticker, dataset):
+        """Return ``dataset`` for ``ticker``, fetching it only if nothing is cached."""
+        key = (ticker.upper(), dataset)
+        self._ensure_worker()
+        entry = self._entries.get(key) or self._read_shared(key)
+        self._touch(key[0])
+        if entry is None:
+            with self._fetch_lock(key):
+                entry = self._entries.get(key)
+                if entry is None:
+                    return self._fetch_once(key)
+        if time.time() - entry[0] > self.ttl:
+            self._schedule(key)
+        return entry[1]
+
+    async def aget(self, ticker, dataset):
+        """Async :meth:`get`. Fresh entries are returned directly, anything else is
+        looked up in a worker thread so a slow upstream never blocks the event loop.
+        """
+        entry = self._entries.get((ticker.upper(), dataset))
+        if entry is not None and time.time() - entry[0] <= self.ttl:
+            self._touch(ticker.upper())
+            return entry[1]
+        return await sync_to_async(
+            self.get, thread_sensitive=False, executor=self._fetch_executor()
+        )(ticker, dataset)
+
+    def _fetch_executor(self):
+        """The thread pool of :meth:`aget`, a new one in a forked process."""
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.fetch_workers,
+                        thread_name_prefix="market-data-fetch",
+                    )
+                    self._executor_pid = pid
+        return self._executor
+
+    def is_cached(self, ticker, dataset):
+        """Whether ``dataset`` can be served without going upstream."""
+        key = (ticker.upper(), dataset)
+        if key in self._entries or self.cache.has_key(self._cache_key(key)):
+            return True
+        return dataset == "history" and bool(self.prices.modified(key[0]))
+
+    def refresh(self, ticker, dataset):
+        """Fetch ``dataset`` from upstream, falling back to any cached copy.
+
+        A copy another process refreshed within ``TTL`` is taken instead.
+        """
+        key = (ticker.upper(), dataset)
+        with self._fetch_lock(key):
+            return self._fetch_once(key, newer_than=time.time() - self.ttl)
+
+    @property
+    def cache(self):
+        # Django hands out one cache connection per thread.
+        return caches[self.cache_alias]
+
+    def _cache_key(self, key):
+        return f"market_data:{key[0]}:{key[1]}"
+
+    def _fetch_once(self, key, newer_than=0):
+        """Fetch ``key`` unless another process stores a copy newer than ``newer_than``."""
+
+        def lookup():
+            entry = self._read_shared(key)
+            if entry is None or entry[0] <= newer_than:
+                return None
+            return entry[1]
+
+        return fetch_once(
+            self.cache, self._cache_key(key), lambda: self._fetch(key), lookup
+        )
+
+    def _fetch_lock(self, key):
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, key):
+        ticker, dataset = key
+        try:
+            if dataset == "history":
+                value = PriceHistory.from_frame(self.prices.update(ticker))
+            else:
+                value = getattr(self.provider, dataset)(ticker)
+            if _is_empty(value):
+                raise ValueError(f"upstream returned no {dataset} data")
+        except Exception as exc:
+            entry = self._entries.get(key) or self._read_shared(key)
+            if entry is None:
+                raise MarketDataUnavailable(
+                    f"{dataset} for {ticker} is not cached and could not be fetched"
+                ) from exc
+            logger.warning("Serving stale %s for %s: %s", dataset, ticker, exc)
+            return entry[1]
+        self._store(key, value)
+        return value
+
+    def version(self, ticker):
+        """Timestamp of the newest cached dataset of ``ticker``."""
+        ticker = ticker.upper()
+        return max(
+            (
+                entry[0]
+                for key, entry in list(self._entries.items())
+                if key[0] == ticker
+            ),
+            default=0,
+        )
+
+    def _read_shared(self, key):
+        try:
+            item = self.cache.get(self._cache_key(key))
+            entry = (item[0], decode(item[1])) if item is not None else None
+        except Exception:
+            logger.exception("Discarding unreadable cache entry for %s", key)
+            entry = None
+        if entry is None and key[1] == "history":
+            # Price files written before the shared cache was filled.
+            value = self.prices.load(key[0])
+            if value is not None:
+                entry = (self.prices.modified(key[0]), value)
+        if entry is None:
+            return None
+        if key[1] == "history":
+            entry = (entry[0], self._compact(key[0], *entry))
+        self._remember(key, entry)
+        return entry
+
+    def _compact(self, ticker, fetched, history):
+        """``history`` as a :class:`PriceHistory`, memory-mapped from its file
+        when ``mmap_history`` is on.
+        """
+        if isinstance(history, pd.DataFrame):
+            history = PriceHistory.from_frame(history)
+        if not self.mmap_history:
+            return history
+        directory = self.cache_dir / "columns" / ticker
+        version = int(fetched * 1000)
+        path = directory / f"{version}.bin"
+        try:
+            if not path.exists():
+                directory.mkdir(parents=True, exist_ok=True)
+                history.save(path)
+                # Older versions may still be mapped, unlinking them is safe.
+                for old in directory.glob("*.bin"):
+                    if int(old.stem) < version:
+                        old.unlink(missing_ok=True)
+            return PriceHistory.load(path, mmap=True)
+        except OSError:
+            logger.exception("Could not map the price history of %s", ticker)
+            return history
+
+    def _store(self, key, value):
+        entry = (time.time(), value)
+        if key[1] == "history":
+            entry = (entry[0], self._compact(key[0], *entry))
+        self._remember(key, entry)
+        try:
+            # No timeout, the last good copy is served when upstream fails.
+            self.cache.set(self._cache_key(key), (entry[0], encode(value)), None)
+        except Exception:
+            logger.exception("Could not write %s to the shared cache", key)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._touch(key[0])
+
+    def _touch(self, ticker):
+        """Mark ``ticker`` as used, forgetting the least recently used tickers
+        beyond ``max_tickers``.
+        """
+        with self._lock:
+            self._tickers[ticker] = True
+            self._tickers.move_to_end(ticker)
+            evicted = []
+            while len(self._tickers) > self.max_tickers:
+                evicted.append(self._tickers.popitem(last=False)[0])
+        for old in evicted:
+            self.forget(old)
+
+    def forget(self, ticker):
+        """Drop the in-memory datasets of ``ticker``, the shared cache keeps them."""
+        ticker = ticker.upper()
+        with self._lock:
+            self._tickers.pop(ticker, None)
+            for key in [key for key in self._entries if key[0] == ticker]:
+                self._entries.pop(key, None)
+            for key in [key for key in self._fetch_locks if key[0] == ticker]:
+                self._fetch_locks.pop(key, None)
+
+    def _schedule(self, key):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._queue.put(key)
+
+    def _ensure_worker(self):
+        if not self.background:
+            return
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="market-data-refresh", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                key = self._queue.get(timeout=self.refresh_interval)
+            except queue.Empty:
+                now = time.time()
+                for key, entry in list(self._entries.items()):
+                    if now - entry[0] > self.ttl:
+                        self._schedule(key)
+                continue
+            try:
+                if key[0] in self._tickers:
+                    self.refresh(*key)
+            except MarketDataUnavailable:
+                logger.exception("Background refresh of %s failed", key)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Return the process-wide :class:`MarketDataService`."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                config = {**DEFAULTS, **getattr(settings, "MARKET_DATA", {})}
+                _service = MarketDataService(
+                    config["CACHE_DIR"],
+                    config["TTL"],
+                    config["REFRESH_INTERVAL"],
+                    get_provider(config["PROVIDER"]),
+                    config["HISTORY_YEARS"],
+                    config["FETCH_WORKERS"],
+                    config["CACHE"],
+                    config["MMAP_HISTORY"],
+                    config["MAX_TICKERS"],
+                )
+    return _service
+
+
+@receiver(setting_changed)
+def _reset_service(setting, **kwargs):
+    """Rebuild the service when ``MARKET_DATA`` is overridden, e.g. in tests."""
+    global _service
+    if setting == "MARKET_DATA":
+        _service = None
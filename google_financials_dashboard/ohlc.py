@@ -0,0 +1,171 @@
+"""
+OHLC aggregation for the candlestick chart.
+
+Daily or minute bars are resampled to coarser bars (first open, max high, min
+low, last close) so that a response never carries more than
+``MAX_POINTS`` bars, whatever the length of the requested range. Minute bars
+go through 5 minute, 30 minute, hourly and daily bars before the calendar
+resolutions. Bars are sorted by date, so each coarser bar is a contiguous run
+of them and is aggregated with NumPy ``reduceat`` instead of a pandas group-by.
+"""
+
+import numpy as np
+import pandas as pd
+
+from google_financials_dashboard.price_history import PRICE_COLUMNS
+
+MAX_POINTS = 600
+
+# (pandas offset alias, approximate calendar days per bar), finest first.
+RESOLUTIONS = [
+    ("D", 7 / 5),
+    ("W-FRI", 7),
+    ("ME", 365.25 / 12),
+    ("QE", 365.25 / 4),
+    ("YE", 365.25),
+]
+
+# (pandas offset alias, minutes per bar) for intraday histories, finest first;
+# "D" then continues with RESOLUTIONS.
+INTRADAY_RESOLUTIONS = [
+    ("min", 1),
+    ("5min", 5),
+    ("30min", 30),
+    ("h", 60),
+    ("D", 24 * 60),
+]
+
+
+def choose_rule(start, end, max_points=MAX_POINTS):
+    """Finest resolution that keeps ``[start, end]`` under ``max_points`` bars."""
+    days = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 1)
+    for rule, days_per_bar in RESOLUTIONS:
+        if days / days_per_bar <= max_points:
+            return rule
+    return RESOLUTIONS[-1][0]
+
+
+def choose_intraday_rule(dates, max_points=MAX_POINTS):
+    """Finest resolution that keeps the minute bars at ``dates`` under
+    ``max_points`` bars.
+
+    Sessions and gaps make the calendar a poor estimate at these resolutions,
+    so the bars of each rule are counted.
+    """
+    for rule, _ in INTRADAY_RESOLUTIONS:
+        labels = period_starts(dates, rule)
+        if np.count_nonzero(labels[1:] != labels[:-1]) + 1 <= max_points:
+            return rule
+    return choose_rule(dates[0], dates[-1], max_points)
+
+
+def period_starts(dates, rule):
+    """Start of the intraday ``rule`` bar each of ``dates`` falls in."""
+    if rule == "D":
+        return dates.astype("datetime64[D]")
+    minutes = dates.astype("datetime64[m]").astype(np.int64)
+    width = dict(INTRADAY_RESOLUTIONS)[rule]
+    return (minutes - minutes % width).astype("datetime64[m]")
+
+
+def _labels(dates, rule):
+    if rule in dict(INTRADAY_RESOLUTIONS):
+        return period_starts(dates, rule)
+    return period_ends(dates.astype("datetime64[D]"), rule)
+
+
+def period_ends(days, rule):
+    """Label of the ``rule`` bar each of ``days`` falls in, as pandas labels it."""
+    if rule == "W-FRI":
+        # 1970-01-01 was a Thursday, Monday is weekday 0.
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days + (4 - weekday) % 7
+    if rule == "ME":
+        return (days.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    if rule == "QE":
+        months = days.astype("datetime64[M]").astype(np.int64)
+        quarter_end = (months - months % 3 + 3).astype("datetime64[M]")
+        return quarter_end.astype("datetime64[D]") - 1
+    return (days.astype("datetime64[Y]") + 1).astype("datetime64[D]") - 1
+
+
+def resample_ohlc(dates, columns, rule, unit="D"):
+    """Bars of ``rule`` from the ``unit`` bars at ``dates`` with OHLC ``columns``."""
+    if rule == unit:
+        return pd.DataFrame({"Date": dates, **{c: columns[c] for c in PRICE_COLUMNS}})
+    labels = _labels(dates, rule)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+    return pd.DataFrame(
+        {
+            "Date": labels[starts].astype("datetime64[ns]"),
+            "Open": columns["Open"][starts],
+            "High": np.maximum.reduceat(columns["High"], starts),
+            "Low": np.minimum.reduceat(columns["Low"], starts),
+            "Close": columns["Close"][ends],
+        }
+    )
+
+
+def bar_ends(dates, rule, unit="D"):
+    """Position of the last of ``dates`` in each ``rule`` bar."""
+    if rule == unit:
+        return np.arange(len(dates))
+    labels = _labels(dates, rule)
+    return np.flatnonzero(np.r_[labels[1:] != labels[:-1], True])
+
+
+def visible_bars(history, start=None, end=None, max_points=MAX_POINTS):
+    """:func:`visible_range` and the position in ``history`` of the last bar
+    aggregated into each of its rows, to sample per-bar series such as
+    indicators at the shown bars.
+    """
+    span = history.span(start, end)
+    dates = history.dates(span)
+    columns = {name: column[span] for name, column in history.columns.items()}
+    if not len(dates):
+        return pd.DataFrame({"Date": dates, **columns}), np.arange(0)
+    unit = history.unit
+    if unit == "min":
+        rule = choose_intraday_rule(dates, max_points)
+    else:
+        rule = choose_rule(dates[0], dates[-1], max_points)
+    return (
+        resample_ohlc(dates, columns, rule, unit),
+        span.start + bar_ends(dates, rule, unit),
+    )
+
+
+def visible_range(history, start=None, end=None, max_points=MAX_POINTS):
+    """Bars of a :class:`~google_financials_dashboard.price_history.PriceHistory`
+    between ``start`` and ``end``, aggregated to at most ``max_points``.
+    """
+    return visible_bars(history, start, end, max_points)[0]
+
+
+def parse_relayout(relayout_data, unit="D"):
+    """Extract the x-axis range from a Plotly ``relayoutData`` event.
+
+    Returns ``(start, end)``, ``(None, None)`` when the axis was reset to
+    autorange, or ``None`` when the event carries no x-axis change at all. For
+    a daily history (``unit`` ``"D"``) the bounds are normalized to whole days,
+    so a day whose bar is partly in view is kept; intraday bounds are kept to
+    the minute.
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return None, None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        bounds = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        bounds = relayout_data["xaxis.range"]
+    else:
+        return None
+    try:
+        start, end = (pd.Timestamp(b) for b in bounds)
+    except (TypeError, ValueError):
+        return None
+    if unit == "D":
+        start, end = start.normalize(), end.normalize()
+    return (start, end) if start <= end else (end, start)
@@ -0,0 +1,130 @@
+"""
+Local, incrementally updated price history per ticker.
+
+Each ticker owns a directory of Parquet files: ``base.parquet`` with the bulk of
+the history and small ``delta-*.parquet`` segments appended by daily updates.
+An update only downloads the bars from the second to last stored date on;
+segments are merged back into the base file once there are ``COMPACT_AFTER``
+of them. The last stored bar may be the unfinished bar of a session still
+trading, so the new download replaces it, and the bar before it, which is
+final, tells whether upstream re-adjusted the series.
+"""
+
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HISTORY_YEARS = 10
+COMPACT_AFTER = 20
+
+# A stored close that moved more than this on refetch means Yahoo re-adjusted
+# the series (split or similar) and the whole history is downloaded again.
+ADJUSTMENT_TOLERANCE = 0.005
+
+
+class PriceStore:
+    """Parquet-backed daily price history, updated with only the missing bars.
+
+    ``download(ticker, start, end=None)`` returns the bars from ``start`` on,
+    usually a provider's ``history`` method.
+    """
+
+    def __init__(self, root, download, history_years=HISTORY_YEARS):
+        self.root = Path(root)
+        self.download = download
+        self.history_years = history_years
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, ticker):
+        return self.root / ticker.upper()
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    def _segments(self, ticker):
+        directory = self._dir(ticker)
+        if not directory.exists():
+            return []
+        deltas = sorted(directory.glob("delta-*.parquet"))
+        base = directory / "base.parquet"
+        return ([base] if base.exists() else []) + deltas
+
+    def modified(self, ticker):
+        """Modification time of the newest segment, 0 when nothing is stored."""
+        return max((p.stat().st_mtime for p in self._segments(ticker)), default=0)
+
+    def load(self, ticker):
+        """Stored history of ``ticker`` sorted by date, or ``None``."""
+        segments = self._segments(ticker)
+        if not segments:
+            return None
+        data = pd.concat([pd.read_parquet(p) for p in segments], ignore_index=True)
+        return data.drop_duplicates("Date", keep="last").sort_values(
+            "Date", ignore_index=True
+        )
+
+    def update(self, ticker):
+        """Fetch the bars missing since the last stored date and return the full history."""
+        with self._ticker_lock(ticker):
+            stored = self.load(ticker)
+            if stored is None or stored.empty:
+                return self._rebuild(ticker)
+
+            last = stored["Date"].iloc[-1]
+            # The last bar may have been stored mid-session, the one before
+            # it is final and can be compared.
+            anchor = -2 if len(stored) > 1 else -1
+            final = stored["Date"].iloc[anchor]
+            new = self.download(ticker, start=final.date())
+            if new.empty or not (new["Date"] > last).any():
+                return stored
+
+            overlap = new[new["Date"] == final]
+            if not overlap.empty:
+                before = stored["Close"].iloc[anchor]
+                after = overlap["Close"].iloc[0]
+                if abs(after - before) > ADJUSTMENT_TOLERANCE * abs(before):
+                    logger.info("%s history was re-adjusted upstream, refetching", ticker)
+                    return self._rebuild(ticker)
+
+            first, end = new["Date"].iloc[0], new["Date"].iloc[-1]
+            self._write(ticker, new, f"delta-{first:%Y%m%d}-{end:%Y%m%d}.parquet")
+            if len(self._segments(ticker)) > COMPACT_AFTER:
+                return self.compact(ticker)
+            return self.load(ticker)
+
+    def compact(self, ticker):
+        """Merge all segments of ``ticker`` into a single base file."""
+        data = self.load(ticker)
+        if data is None:
+            return None
+        deltas = [p for p in self._segments(ticker) if p.name != "base.parquet"]
+        self._write(ticker, data, "base.parquet")
+        for path in deltas:
+            path.unlink(missing_ok=True)
+        return data
+
+    def _rebuild(self, ticker):
+        start = date.today() - timedelta(days=round(365.25 * self.history_years))
+        data = self.download(ticker, start=start)
+        if data.empty:
+            return data
+        for path in self._segments(ticker):
+            path.unlink(missing_ok=True)
+        self._write(ticker, data, "base.parquet")
+        return data
+
+    def _write(self, ticker, data, name):
+        directory = self._dir(ticker)
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f".{name}.{os.getpid()}.tmp"
+        data.to_parquet(tmp, index=False)
+        os.replace(tmp, directory / name)
@@ -0,0 +1,398 @@
+"""
+Upstream data providers for the financials dashboard.
+
+A provider turns a ticker into raw datasets: daily (or intraday) price bars,
+the yearly income statement and cash flow, the ticker info dict and the
+analyst estimates, shaped like yfinance returns them. The :class:`~google_financials_dashboard.market_data.MarketDataService`
+uses the provider configured in ``MARKET_DATA["PROVIDER"]``:
+
+* :class:`YahooProvider` talks to Yahoo Finance through yfinance and the shared
+  :class:`~google_financials_dashboard.upstream.UpstreamClient`.
+* :class:`FixtureProvider` works offline. It replays files recorded with
+  ``manage.py record_fixtures`` and otherwise generates deterministic synthetic
+  data of any size, so the dashboard can run and be benchmarked without network.
+"""
+
+import json
+import time
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.utils.module_loading import import_string
+
+from google_financials_dashboard.upstream import UpstreamClient
+
+COLUMNS = ["Date", "Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+DEFAULT_PROVIDER = {
+    "BACKEND": "google_financials_dashboard.providers.YahooProvider",
+    "OPTIONS": {},
+}
+
+
+class Provider:
+    """Interface of a market data source."""
+
+    def history(self, ticker, start, end=None):
+        """Price bars of ``ticker`` from ``start`` up to and including ``end``."""
+        raise NotImplementedError
+
+    def financials(self, ticker):
+        """Yearly income statement, one row per fiscal year end."""
+        raise NotImplementedError
+
+    def cashflow(self, ticker):
+        """Yearly cash flow statement, one row per fiscal year end."""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """Dict of ticker facts (``sharesOutstanding``, ``totalDebt``, ``totalCash``)."""
+        raise NotImplementedError
+
+    def estimates(self, ticker):
+        """Dict of analyst estimates (``forwardEps``, ``forwardPE``)."""
+        raise NotImplementedError
+
+
+YAHOO_URL = "https://query2.finance.yahoo.com"
+
+# Statement line items the dashboard reads, by Yahoo time series name. All of
+# them come from one fundamentals time series request, along with INFO_FIELDS.
+STATEMENT_FIELDS = {
+    "financials": {
+        "TotalRevenue": "Total Revenue",
+        "CostOfRevenue": "Cost Of Revenue",
+        "GrossProfit": "Gross Profit",
+    },
+    "cashflow": {
+        "OperatingCashFlow": "Operating Cash Flow",
+        "CapitalExpenditure": "Capital Expenditure",
+        "FreeCashFlow": "Free Cash Flow",
+    },
+}
+
+# Info keys by Yahoo time series name, read from the latest quarterly balance
+# sheet like quoteSummary reports them.
+INFO_FIELDS = {
+    "OrdinarySharesNumber": "sharesOutstanding",
+    "TotalDebt": "totalDebt",
+    "CashCashEquivalentsAndShortTermInvestments": "totalCash",
+}
+
+# quoteSummary modules holding the estimates (forwardEps, forwardPE).
+ESTIMATE_MODULES = ("defaultKeyStatistics",)
+
+# Yahoo keeps at most four fiscal years of statements.
+STATEMENT_START = pd.Timestamp("2016-12-31")
+
+
+class YahooProvider(Provider):
+    """Live data from Yahoo Finance.
+
+    All requests go through one :class:`~google_financials_dashboard.upstream.UpstreamClient`
+    and only ask for the fields in use: both statements and the info come from
+    a single time series request, so a dashboard ticker costs it and the price
+    history only. The estimates, which only the screener reads, come from one
+    quoteSummary module. The options configure the client.
+    """
+
+    def __init__(
+        self,
+        rate=2.0,
+        burst=5,
+        failure_threshold=5,
+        reset_timeout=60,
+        pool_size=32,
+        coalesce=60,
+        statement_fields=None,
+        info_fields=None,
+        estimate_modules=ESTIMATE_MODULES,
+    ):
+        self.client = UpstreamClient(
+            rate, burst, failure_threshold, reset_timeout, pool_size, coalesce
+        )
+        self.statement_fields = statement_fields or STATEMENT_FIELDS
+        self.info_fields = info_fields or INFO_FIELDS
+        self.estimate_modules = tuple(estimate_modules)
+
+    def _data(self):
+        from yfinance.data import YfData
+
+        # yfinance keeps one YfData per process, bound to the shared session.
+        return YfData(session=self.client.session)
+
+    def history(self, ticker, start, end=None):
+        import yfinance as yf
+
+        end = (end or date.today()) + timedelta(days=1)
+        data = self.client.call(
+            ("history", ticker, start, end),
+            lambda: yf.Ticker(ticker, session=self.client.session).history(
+                start=start,
+                end=end,
+                auto_adjust=False,
+                actions=False,
+                raise_errors=True,
+            ),
+        )
+        data = pd.DataFrame(data).reset_index()
+        if data.empty:
+            return data
+        data["Date"] = pd.to_datetime(data["Date"]).dt.tz_localize(None)
+        return data[[c for c in COLUMNS if c in data.columns]]
+
+    def _fundamentals(self, ticker):
+        """Yearly statement and quarterly info series as ``{name: {asOfDate: value}}``,
+        all from one request.
+        """
+
+        def fetch():
+            types = {
+                f"annual{name}": name
+                for fields in self.statement_fields.values()
+                for name in fields
+            }
+            types.update((f"quarterly{name}", name) for name in self.info_fields)
+            end = pd.Timestamp.now("UTC").ceil("D")
+            result = self._data().get_raw_json(
+                f"{YAHOO_URL}/ws/fundamentals-timeseries/v1/finance/timeseries/{ticker}",
+                params={
+                    "symbol": ticker,
+                    "type": ",".join(types),
+                    "period1": int(STATEMENT_START.timestamp()),
+                    "period2": int(end.timestamp()),
+                },
+            )
+            series = {}
+            for item in result["timeseries"]["result"] or []:
+                name = item["meta"]["type"][0]
+                series[types.get(name, name)] = {
+                    pd.Timestamp(point["asOfDate"]): point["reportedValue"]["raw"]
+                    for point in item.get(name) or []
+                    if point
+                }
+            return series
+
+        return self.client.call(("fundamentals", ticker), fetch)
+
+    def _statement(self, ticker, statement):
+        series = self._fundamentals(ticker)
+        fields = self.statement_fields[statement]
+        frame = pd.DataFrame(
+            {label: series[name] for name, label in fields.items() if name in series},
+            dtype="float64",
+        )
+        return frame.sort_index(ascending=False)
+
+    def financials(self, ticker):
+        return self._statement(ticker, "financials")
+
+    def cashflow(self, ticker):
+        return self._statement(ticker, "cashflow")
+
+    def info(self, ticker):
+        series = self._fundamentals(ticker)
+        info = {"symbol": ticker.upper()}
+        for name, key in self.info_fields.items():
+            if series.get(name):
+                info[key] = series[name][max(series[name])]
+        return info
+
+    def estimates(self, ticker):
+        def fetch():
+            return self._data().get_raw_json(
+                f"{YAHOO_URL}/v10/finance/quoteSummary/{ticker}",
+                params={
+                    "modules": ",".join(self.estimate_modules),
+                    "formatted": "false",
+                    "symbol": ticker,
+                },
+            )
+
+        result = self.client.call(("estimates", ticker), fetch)
+        modules = (result["quoteSummary"]["result"] or [{}])[0]
+        estimates = {"symbol": ticker.upper()}
+        for values in modules.values():
+            if isinstance(values, dict):
+                estimates.update(
+                    (key, value.get("raw") if isinstance(value, dict) else value)
+                    for key, value in values.items()
+                    if value not in (None, {}, "")
+                )
+        return estimates
+
+
+# Regular US session, 09:30 to 16:00.
+SESSION_MINUTES = 390
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+
+FREQUENCIES = ("1d", "1min")
+
+
+class FixtureProvider(Provider):
+    """Offline provider: recorded fixtures first, deterministic synthetic data otherwise.
+
+    Recorded files live in ``directory/<TICKER>/`` as ``history.parquet``,
+    ``financials.parquet``, ``cashflow.parquet``, ``info.json`` and
+    ``estimates.json``. Synthetic
+    prices are a random walk seeded by ``seed`` and the ticker, starting at
+    ``origin`` with one bar per business day (``"1d"``) or per regular-session
+    minute (``"1min"``). The same arguments always produce the same data and
+    a longer range only appends bars, so incremental updates line up.
+    ``latency`` seconds are slept on every call to mimic a remote upstream.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        seed=0,
+        origin="2000-01-03",
+        frequency="1d",
+        statement_years=4,
+        today=None,
+        latency=0,
+    ):
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"frequency must be one of {FREQUENCIES}")
+        self.directory = Path(directory) if directory else None
+        self.seed = seed
+        self.origin = pd.Timestamp(origin)
+        self.frequency = frequency
+        self.statement_years = statement_years
+        self.today = pd.Timestamp(today).date() if today else None
+        self.latency = latency
+
+    def _rng(self, ticker, stream):
+        return np.random.default_rng(
+            [self.seed, zlib.crc32(ticker.upper().encode()), stream]
+        )
+
+    def _recorded(self, ticker, name):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.directory is None:
+            return None
+        path = self.directory / ticker.upper() / name
+        return path if path.exists() else None
+
+    def history(self, ticker, start, end=None):
+        end = end or self.today or date.today()
+        path = self._recorded(ticker, "history.parquet")
+        data = pd.read_parquet(path) if path else self._bars(ticker, end)
+        dates = data["Date"]
+        mask = (dates >= pd.Timestamp(start)) & (
+            dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+        )
+        return data[mask].reset_index(drop=True)
+
+    def _bars(self, ticker, end):
+        days = pd.bdate_range(self.origin, pd.Timestamp(end))
+        if self.frequency == "1min":
+            minutes = SESSION_OPEN + pd.to_timedelta(np.arange(SESSION_MINUTES), "min")
+            dates = pd.DatetimeIndex(
+                (days.values[:, None] + minutes.values[None, :]).ravel()
+            )
+            bars_per_year = 252 * SESSION_MINUTES
+        else:
+            dates = days
+            bars_per_year = 252
+        n = len(dates)
+        if n == 0:
+            return pd.DataFrame(columns=COLUMNS)
+
+        # Draws are taken in a fixed order, so a later ``end`` only appends.
+        rng = self._rng(ticker, 0)
+        start_price = 20 + 180 * rng.random()
+        sigma = (0.2 + 0.2 * rng.random()) / np.sqrt(bars_per_year)
+        mu = 0.08 / bars_per_year - sigma**2 / 2
+        steps = np.random.default_rng(rng.integers(2**63)).standard_normal((n, 4))
+
+        close = start_price * np.exp(np.cumsum(mu + sigma * steps[:, 0]))
+        open_ = np.empty(n)
+        open_[0] = start_price
+        open_[1:] = close[:-1]
+        wick = sigma * np.abs(steps[:, 1:])
+        high = np.maximum(open_, close) * (1 + wick[:, 0])
+        low = np.minimum(open_, close) * (1 - wick[:, 1])
+        volume = (1e6 / (bars_per_year / 252) * np.exp(steps[:, 3] * 0.3)).astype(
+            "int64"
+        )
+        return pd.DataFrame(
+            {
+                "Date": dates,
+                "Open": open_,
+                "High": high,
+                "Low": low,
+                "Close": close,
+                "Adj Close": close,
+                "Volume": volume,
+            }
+        )
+
+    def _statements(self, ticker):
+        end = self.today or date.today()
+        years = np.arange(end.year - self.statement_years, end.year)[::-1]
+        rng = self._rng(ticker, 1)
+        growth = rng.normal(0.10, 0.05, len(years))
+        revenue = 1e9 * (5 + 300 * rng.random()) / np.cumprod(1 + growth)
+        gross_margin = 0.3 + 0.4 * rng.random() + rng.normal(0, 0.01, len(years))
+        fcf_margin = 0.1 + 0.2 * rng.random() + rng.normal(0, 0.02, len(years))
+        operating_cash_flow = revenue * (fcf_margin + 0.05)
+        index = pd.DatetimeIndex([f"{year}-12-31" for year in years])
+        financials = pd.DataFrame(
+            {
+                "Total Revenue": revenue,
+                "Cost Of Revenue": revenue * (1 - gross_margin),
+                "Gross Profit": revenue * gross_margin,
+            },
+            index=index,
+        )
+        cashflow = pd.DataFrame(
+            {
+                "Operating Cash Flow": operating_cash_flow,
+                "Capital Expenditure": -(operating_cash_flow - revenue * fcf_margin),
+                "Free Cash Flow": revenue * fcf_margin,
+            },
+            index=index,
+        )
+        return financials, cashflow
+
+    def financials(self, ticker):
+        path = self._recorded(ticker, "financials.parquet")
+        return pd.read_parquet(path) if path else self._statements(ticker)[0]
+
+    def cashflow(self, ticker):
+        path = self._recorded(ticker, "cashflow.parquet")
+        return pd.read_parquet(path) if path else self._statements(ticker)[1]
+
+    def info(self, ticker):
+        path = self._recorded(ticker, "info.json")
+        if path:
+            return json.loads(path.read_text(encoding="utf-8"))
+        rng = self._rng(ticker, 2)
+        return {
+            "symbol": ticker.upper(),
+            "sharesOutstanding": int(1e8 * (1 + 99 * rng.random())),
+            "totalDebt": int(2e10 * rng.random()),
+            "totalCash": int(2e10 * rng.random()),
+        }
+
+    def estimates(self, ticker):
+        path = self._recorded(ticker, "estimates.json")
+        if path:
+            return json.loads(path.read_text(encoding="utf-8"))
+        rng = self._rng(ticker, 3)
+        return {
+            "symbol": ticker.upper(),
+            "forwardEps": round(float(1 + 9 * rng.random()), 2),
+            "forwardPE": round(float(10 + 30 * rng.random()), 2),
+        }
+
+
+def get_provider(config=None):
+    """Instantiate the provider described by a ``{"BACKEND", "OPTIONS"}`` dict."""
+    config = {**DEFAULT_PROVIDER, **(config or {})}
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from google_financials_dashboard.consumers import LiveBarsConsumer
+from google_financials_dashboard.live import WS_PATH
+
+websocket_urlpatterns = [
+    path(WS_PATH, LiveBarsConsumer.as_asgi()),
+]
@@ -0,0 +1,204 @@
+"""
+Fundamentals screener over a universe of tickers.
+
+The statements, info and estimates of every ticker are fetched through the
+market data service by a bounded thread pool. Requests that reach upstream are
+paced by the provider's own rate limit (see :mod:`~google_financials_dashboard.upstream`),
+so a large universe does not get throttled. The key facts are then computed in a
+process pool, one vectorized :func:`batch_key_facts` call per chunk of tickers,
+along with the Monte Carlo DCF fair value of each ticker, and collected into a
+single table with one row per ticker.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from google_financials_dashboard.key_facts import (
+    CAGR_YEARS,
+    batch_key_facts,
+    statements_by_year,
+)
+from google_financials_dashboard.market_data import MarketDataUnavailable, get_service
+from google_financials_dashboard.valuation import fair_value_distribution, net_debt
+
+logger = logging.getLogger(__name__)
+
+DATASETS = ("financials", "cashflow", "info", "estimates")
+
+COLUMNS = [
+    "ticker",
+    "year",
+    "revenue",
+    f"revenue_cagr_{CAGR_YEARS[0]}y",
+    "gross_margin",
+    "fcf_margin",
+    "forward_eps",
+    "forward_pe",
+    "fair_value_p10",
+    "fair_value",
+    "fair_value_p90",
+]
+
+# Screener column -> percentile of the DCF fair value distribution.
+VALUATION_COLUMNS = {
+    "fair_value_p10": "p10",
+    "fair_value": "p50",
+    "fair_value_p90": "p90",
+}
+
+CHUNK_SIZE = 50
+
+
+def fetch_universe(tickers, workers=8):
+    """Fetch the screener datasets of ``tickers``.
+
+    Returns ``(data, errors)``: ``{ticker: {dataset: value}}`` for the tickers
+    that could be fetched and ``{ticker: message}`` for the others.
+    """
+    service = get_service()
+
+    def fetch(ticker):
+        return {dataset: service.get(ticker, dataset) for dataset in DATASETS}
+
+    data, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {ticker: pool.submit(fetch, ticker) for ticker in tickers}
+        for ticker, future in futures.items():
+            try:
+                data[ticker] = future.result()
+            except MarketDataUnavailable as exc:
+                errors[ticker] = str(exc)
+            except Exception as exc:
+                logger.exception("Screener could not fetch %s", ticker)
+                errors[ticker] = str(exc)
+    return data, errors
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _valuation(ticker, facts, info):
+    try:
+        shares = info.get("sharesOutstanding")
+        valuation = fair_value_distribution(
+            ticker, facts, shares, net_debt=net_debt(info)
+        )
+        return valuation or {}
+    except Exception:
+        logger.exception("Screener could not value %s", ticker)
+        return {}
+
+
+def compute_chunk(data):
+    """Screener rows of ``{ticker: {dataset: value}}``, run in a worker process.
+
+    Returns ``(rows, errors)``, a ticker whose statements cannot be read is
+    left out of the rows with its error.
+    """
+    statements, errors = {}, {}
+    for ticker, datasets in data.items():
+        try:
+            frame = statements_by_year(datasets["financials"], datasets["cashflow"])
+        except Exception as exc:
+            logger.exception("Screener could not read the statements of %s", ticker)
+            errors[ticker] = str(exc)
+            continue
+        if frame["revenue"].notna().any():
+            statements[ticker] = frame
+    if not statements:
+        return pd.DataFrame(columns=COLUMNS), errors
+    facts = batch_key_facts(statements)
+    valuations = {
+        ticker: _valuation(
+            ticker, facts.xs(ticker, level="ticker"), data[ticker]["info"]
+        )
+        for ticker in statements
+    }
+    facts = facts.dropna(subset=["revenue"])
+    rows = facts.groupby(level="ticker").tail(1).reset_index()
+    estimates = pd.DataFrame(
+        {
+            "ticker": list(data),
+            "forward_eps": [
+                _number(d["estimates"].get("forwardEps")) for d in data.values()
+            ],
+            "forward_pe": [
+                _number(d["estimates"].get("forwardPE")) for d in data.values()
+            ],
+        }
+    )
+    rows = rows.merge(estimates, on="ticker", how="left")
+    for column, percentile in VALUATION_COLUMNS.items():
+        rows[column] = [valuations[t].get(percentile, np.nan) for t in rows["ticker"]]
+    return rows[COLUMNS], errors
+
+
+def _compute(call, chunk):
+    """``call()``'s result, or every ticker of ``chunk`` as failed if it raises."""
+    try:
+        return call()
+    except Exception as exc:
+        logger.exception("Screener could not compute a chunk of %d tickers", len(chunk))
+        return pd.DataFrame(columns=COLUMNS), {ticker: str(exc) for ticker in chunk}
+
+
+def screen(tickers, workers=8, processes=None, chunk_size=CHUNK_SIZE):
+    """Screener table of ``tickers`` and ``{ticker: error}`` for the failed ones.
+
+    ``processes=0`` computes in this process, which is faster for a handful of
+    tickers than starting a pool.
+    """
+    data, errors = fetch_universe(tickers, workers)
+    items = list(data.items())
+    chunks = [dict(items[i : i + chunk_size]) for i in range(0, len(items), chunk_size)]
+    if processes == 0 or len(chunks) <= 1:
+        results = [_compute(partial(compute_chunk, chunk), chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [(pool.submit(compute_chunk, chunk), chunk) for chunk in chunks]
+            results = [_compute(future.result, chunk) for future, chunk in futures]
+    frames = []
+    for rows, chunk_errors in results:
+        errors.update(chunk_errors)
+        if not rows.empty:
+            frames.append(rows)
+    table = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=COLUMNS)
+    )
+    screened = set(table["ticker"])
+    for ticker in data:
+        if ticker not in screened and ticker not in errors:
+            errors[ticker] = "no usable statements"
+    return table, errors
+
+
+def _result_path():
+    return get_service().cache_dir / "screener.parquet"
+
+
+def save_result(table):
+    """Keep ``table`` as the latest full screener run, served by the API."""
+    path = _result_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    table.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load_result():
+    """Table of the latest saved screener run, or ``None``."""
+    try:
+        return pd.read_parquet(_result_path())
+    except FileNotFoundError:
+        return None
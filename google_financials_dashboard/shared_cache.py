@@ -0,0 +1,93 @@
+"""
+Market data and figures shared between server processes through Django's cache.
+
+``MARKET_DATA["CACHE"]`` names the alias in ``settings.CACHES``: local memory
+keeps everything per process, the file-based backend shares it between the
+workers of one machine and Redis or memcached between machines. Values are
+stored as bytes: price histories in their columnar format, other DataFrames as
+Parquet, dicts as JSON and figures as compressed JSON, so no DataFrame is ever
+pickled into the shared store.
+
+A worker about to go upstream first claims the dataset with ``cache.add``; the
+other workers wait for its result instead of fetching the same data again.
+"""
+
+import io
+import json
+import time
+import zlib
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+
+from google_financials_dashboard.price_history import PriceHistory
+
+DEFAULT_ALIAS = "default"
+
+# Longest a worker waits for another one's fetch before fetching itself.
+FETCH_LOCK_TIMEOUT = 60
+POLL_INTERVAL = 0.05
+
+PARQUET = b"P"
+JSON = b"J"
+PRICES = b"H"
+
+
+def get_cache():
+    """The cache configured by ``MARKET_DATA["CACHE"]``."""
+    return caches[getattr(settings, "MARKET_DATA", {}).get("CACHE", DEFAULT_ALIAS)]
+
+
+def encode(value):
+    """``value`` as bytes: a DataFrame as Parquet, anything else as JSON."""
+    if isinstance(value, PriceHistory):
+        return PRICES + value.to_bytes()
+    if isinstance(value, pd.DataFrame):
+        buffer = io.BytesIO()
+        value.to_parquet(buffer)
+        return PARQUET + buffer.getvalue()
+    return JSON + json.dumps(value, default=str).encode()
+
+
+def decode(data):
+    """Inverse of :func:`encode`."""
+    if data[:1] == PRICES:
+        return PriceHistory.from_bytes(memoryview(data)[1:])
+    if data[:1] == PARQUET:
+        return pd.read_parquet(io.BytesIO(data[1:]))
+    return json.loads(data[1:])
+
+
+def encode_figure(figure_json):
+    return zlib.compress(figure_json.encode(), 1)
+
+
+def decode_figure(data):
+    return zlib.decompress(data).decode()
+
+
+def fetch_once(cache, key, fetch, lookup):
+    """Run ``fetch()`` unless another process already does it for ``key``.
+
+    In that case wait for ``lookup()`` to find that process's result, and
+    fetch anyway if it does not appear within ``FETCH_LOCK_TIMEOUT``.
+    """
+    lock = f"{key}:fetching"
+    # Atomic in Redis, memcached and local memory; the file-based backend
+    # can let two processes through at the same moment.
+    if cache.add(lock, 1, FETCH_LOCK_TIMEOUT):
+        try:
+            # The previous holder may have finished just before.
+            value = lookup()
+            return value if value is not None else fetch()
+        finally:
+            cache.delete(lock)
+    deadline = time.monotonic() + FETCH_LOCK_TIMEOUT
+    while time.monotonic() < deadline and cache.has_key(lock):
+        time.sleep(POLL_INTERVAL)
+        value = lookup()
+        if value is not None:
+            return value
+    value = lookup()
+    return value if value is not None else fetch()
@@ -1,3 +1,971 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import requests
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from plotly.utils import PlotlyJSONEncoder
+
+from google_financials_dashboard import (
+    encoding,
+    indicators,
+    live,
+    ohlc,
+    screener,
+    shared_cache,
+    tickers,
+    upstream,
+    valuation,
+)
+from google_financials_dashboard.dash_apps import dash_app
+from google_financials_dashboard.figures import figure_cache
+from google_financials_dashboard.key_facts import compute_key_facts, statements_by_year
+from google_financials_dashboard.layout_cache import get_layout_cache
+from google_financials_dashboard.management.commands.loadtest import (
+    plot_callback_body,
+)
+from google_financials_dashboard.market_data import (
+    MarketDataService,
+    MarketDataUnavailable,
+    get_service,
+)
+from google_financials_dashboard.price_history import PriceHistory
+from google_financials_dashboard.price_store import PriceStore
+from google_financials_dashboard.providers import FixtureProvider, YahooProvider
+from jhonatan_projects import metrics
+
+DASH_APP = "/django_plotly_dash/app/google_dashboard"
+SCREENER_URL = "/google_financials_dashboard_project/screener/"
+
+TEST_CACHES = {
+    **settings.CACHES,
+    "tests": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "google_financials_dashboard-tests",
+    },
+}
+
+
+class FixtureTestCase(TestCase):
+    """Runs against a fresh FixtureProvider-backed market data service."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        market_data = {
+            "CACHE_DIR": self.cache_dir,
+            "CACHE": "tests",
+            "TICKERS": ["GOOGL", "AAPL"],
+            "PRELOAD_TICKERS": [],
+            "PROVIDER": {
+                "BACKEND": "google_financials_dashboard.providers.FixtureProvider",
+                "OPTIONS": {"origin": "2020-01-02"},
+            },
+        }
+        overrides = override_settings(MARKET_DATA=market_data, CACHES=TEST_CACHES)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        caches["tests"].clear()
+        figure_cache.clear()
+        get_layout_cache().clear()
+        dash_app._prerendered = None
+
+
+class DashboardTests(FixtureTestCase):
+    def test_page(self):
+        response = self.client.get("/google_financials_dashboard_project/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "google_dashboard")
+
+    def test_layout_is_prerendered_and_revalidated(self):
+        response = self.client.get(f"{DASH_APP}/_dash-layout")
+        self.assertEqual(response.status_code, 200)
+        layout = json.loads(response.content)
+        self.assertIn("%", json.dumps(layout))
+        self.assertIn("candlestick", response.content.decode())
+
+        again = self.client.get(
+            f"{DASH_APP}/_dash-layout", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_callbacks_reuse_layout_without_loading(self):
+        dash_app.serve_layout()
+        load = mock.Mock(wraps=tickers.get_ticker_data)
+        with mock.patch.object(dash_app, "get_ticker_data", load):
+            for _ in range(3):
+                self.client.post(
+                    f"{DASH_APP}/_dash-update-component",
+                    json.dumps(plot_callback_body("AAPL")),
+                    content_type="application/json",
+                )
+            dash_app.layout_version()
+        self.assertEqual([c.args for c in load.call_args_list], [("AAPL",)] * 3)
+
+    def test_outage_layout_is_reused_until_retry(self):
+        outage = MarketDataUnavailable("GOOGL")
+        load = mock.Mock(side_effect=[outage, outage, tickers.get_ticker_data("GOOGL")])
+        now = time.monotonic()
+        with mock.patch.object(dash_app, "get_ticker_data", load), mock.patch.object(
+            dash_app.time, "monotonic", return_value=now
+        ) as clock:
+            layout = dash_app.serve_layout()
+            self.assertIs(dash_app.serve_layout(), layout)
+            self.assertIsNone(dash_app.layout_version())
+            self.assertEqual(load.call_count, 1)
+            clock.return_value += dash_app.RETRY_AFTER
+            self.assertIsNone(dash_app.layout_version())
+            self.assertEqual(load.call_count, 2)
+            clock.return_value += dash_app.RETRY_AFTER
+            self.assertIsNotNone(dash_app.layout_version())
+            self.assertEqual(load.call_count, 3)
+
+    def test_plot_callback(self):
+        response = self.client.post(
+            f"{DASH_APP}/_dash-update-component",
+            json.dumps(plot_callback_body("AAPL")),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        outputs = json.loads(response.content)["response"]
+        self.assertEqual(outputs["revenue_fcf"]["figure"]["data"][0]["name"], "Revenue")
+        self.assertTrue(outputs["kpi-cagr"]["children"].endswith("%"))
+        self.assertTrue(outputs["kpi-fair-value"]["children"].startswith("$"))
+
+    def test_plot_callback_unavailable_ticker(self):
+        down = mock.Mock(side_effect=OSError("upstream is down"))
+        with mock.patch.multiple(
+            FixtureProvider, history=down, financials=down, cashflow=down, info=down
+        ):
+            response = self.client.post(
+                f"{DASH_APP}/_dash-update-component",
+                json.dumps(plot_callback_body("MSFT")),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        outputs = json.loads(response.content)["response"]
+        self.assertEqual(outputs["kpi-cagr"]["children"], "n/a")
+
+    def test_plot_callback_missing_statements(self):
+        financials = FixtureProvider.financials
+
+        def bank(provider, ticker):
+            # Three years without cost of revenue, too few for the CAGR.
+            return financials(provider, ticker).drop(columns="Cost Of Revenue")[:3]
+
+        with mock.patch.object(FixtureProvider, "financials", bank):
+            response = self.client.post(
+                f"{DASH_APP}/_dash-update-component",
+                json.dumps(plot_callback_body("BANK")),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        outputs = json.loads(response.content)["response"]
+        self.assertEqual(outputs["kpi-cagr"]["children"], "n/a")
+        self.assertEqual(outputs["kpi-ltm-gm"]["children"], "n/a")
+        self.assertTrue(outputs["kpi-ltm-fcf"]["children"].endswith("%"))
+
+
+class TickerCacheTests(FixtureTestCase):
+    def test_concurrent_gets_load_once(self):
+        cache = tickers.TickerCache()
+        load = tickers.TickerData.load
+        calls = []
+
+        def slow_load(ticker, concurrent=True):
+            calls.append(ticker)
+            time.sleep(0.1)
+            return load(ticker, concurrent)
+
+        results = []
+        with mock.patch.object(tickers.TickerData, "load", slow_load):
+            threads = [
+                threading.Thread(target=lambda: results.append(cache.get("AAPL")))
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(calls, ["AAPL"])
+        self.assertIs(results[0], results[1])
+        self.assertEqual(cache._loading, {})
+
+    def test_evicts_the_least_recently_used(self):
+        cache = tickers.TickerCache(maxsize=2)
+        with mock.patch.object(get_service(), "forget") as forget:
+            cache.get("AAPL")
+            cache.get("GOOGL")
+            cache.get("AAPL")
+            cache.get("MSFT")
+        self.assertEqual(list(cache._items), ["AAPL", "MSFT"])
+        forget.assert_called_once_with("GOOGL")
+
+    def test_retries_after_a_failed_load(self):
+        cache = tickers.TickerCache()
+        with mock.patch.object(
+            tickers.TickerData, "load", side_effect=MarketDataUnavailable("down")
+        ):
+            with self.assertRaises(MarketDataUnavailable):
+                cache.get("AAPL")
+        self.assertEqual(cache._loading, {})
+        self.assertEqual(cache.get("AAPL").ticker, "AAPL")
+
+
+def decode_typed_array(spec):
+    return np.frombuffer(base64.b64decode(spec["bdata"]), np.dtype(spec["dtype"]))
+
+
+class EncodingTests(TestCase):
+    def test_typed_arrays_round_trip(self):
+        dates = pd.date_range("2024-01-01", periods=100, freq="D")
+        close = np.linspace(100, 200, 100).round(2)
+        volume = np.arange(100) * 1000
+        figure = go.Figure(
+            [
+                go.Candlestick(
+                    x=dates, open=close, high=close + 1, low=close - 1, close=close
+                ),
+                go.Bar(x=dates, y=volume, yaxis="y2"),
+            ]
+        )
+        encoded = json.loads(encoding.figure_to_json(figure, binary=True))
+        candles, bars = encoded["data"]
+        self.assertEqual(encoded["layout"]["xaxis"]["type"], "date")
+        self.assertEqual(candles["close"]["dtype"], "f4")
+        np.testing.assert_array_equal(
+            decode_typed_array(candles["x"]).astype("datetime64[ms]"),
+            dates.values.astype("datetime64[ms]"),
+        )
+        np.testing.assert_allclose(
+            decode_typed_array(candles["close"]), close, rtol=1e-6
+        )
+        np.testing.assert_array_equal(decode_typed_array(bars["y"]), volume)
+
+    def test_short_arrays_stay_lists(self):
+        figure = go.Figure([go.Scatter(x=[1, 2, 3], y=[4.0, 5.0, 6.0])])
+        encoded = json.loads(encoding.figure_to_json(figure, binary=True))
+        self.assertEqual(encoded["data"][0]["y"], [4.0, 5.0, 6.0])
+
+
+class Upstream:
+    """Download function over a daily series that grows by ``advance`` days."""
+
+    def __init__(self, days=30):
+        dates = pd.bdate_range(date.today() - timedelta(days=200), periods=days)
+        close = np.linspace(100, 130, days)
+        self.bars = pd.DataFrame(
+            {
+                "Date": dates,
+                "Open": close,
+                "High": close + 1,
+                "Low": close - 1,
+                "Close": close,
+                "Volume": np.full(days, 1000),
+            }
+        )
+        self.starts = []
+
+    def advance(self, days=1):
+        last = self.bars.iloc[-1]
+        new = pd.DataFrame(
+            [
+                {**last, "Date": last["Date"] + pd.offsets.BDay(i)}
+                for i in range(1, days + 1)
+            ]
+        )
+        self.bars = pd.concat([self.bars, new], ignore_index=True)
+
+    def __call__(self, ticker, start, end=None):
+        self.starts.append(pd.Timestamp(start))
+        return self.bars[self.bars["Date"] >= pd.Timestamp(start)].reset_index(
+            drop=True
+        )
+
+
+class PriceStoreTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.upstream = Upstream()
+        self.store = PriceStore(self.root, self.upstream)
+        self.store.update("TEST")
+
+    def files(self):
+        return sorted(p.name for p in (Path(self.root) / "TEST").glob("*.parquet"))
+
+    def test_appends_delta_segments(self):
+        self.upstream.advance(3)
+        data = self.store.update("TEST")
+        # Downloaded from the second to last stored bar on.
+        self.assertEqual(self.upstream.starts[-1], self.upstream.bars["Date"].iloc[-5])
+        self.assertEqual(len(self.files()), 2)
+        pd.testing.assert_frame_equal(
+            data.reset_index(drop=True), self.upstream.bars, check_dtype=False
+        )
+
+    def test_nothing_new(self):
+        self.store.update("TEST")
+        self.assertEqual(self.files(), ["base.parquet"])
+
+    def test_refetches_a_readjusted_history(self):
+        self.upstream.advance(1)
+        # A 2:1 split re-adjusts every bar before the new one.
+        before = self.upstream.bars.index[:-1]
+        self.upstream.bars.loc[before, ["Open", "High", "Low", "Close"]] /= 2
+        data = self.store.update("TEST")
+        self.assertEqual(self.files(), ["base.parquet"])
+        # The whole history was downloaded again.
+        self.assertEqual(self.upstream.starts[-1], self.upstream.starts[0])
+        self.assertAlmostEqual(
+            data["Close"].iloc[0], self.upstream.bars["Close"].iloc[0]
+        )
+
+    def test_compacts_after_enough_segments(self):
+        with mock.patch("google_financials_dashboard.price_store.COMPACT_AFTER", 2):
+            self.upstream.advance(1)
+            self.store.update("TEST")
+            self.assertEqual(len(self.files()), 2)
+            # A third segment is one more than COMPACT_AFTER.
+            self.upstream.advance(1)
+            data = self.store.update("TEST")
+        self.assertEqual(self.files(), ["base.parquet"])
+        self.assertEqual(len(data), len(self.upstream.bars))
+
+
+class LiveBarsTests(FixtureTestCase):
+    def poll(self, **params):
+        return self.client.get(
+            "/google_financials_dashboard_project/live/GOOGL/", params
+        )
+
+    def test_polls_new_bars(self):
+        session, published = live.clock()
+        message = self.poll(session=session, count=0).json()
+        self.assertEqual(message["type"], "bars")
+        self.assertGreaterEqual(len(message["bars"]["x"]), published)
+        self.assertEqual(
+            self.poll(session=session - 1, count=0).json()["type"], "reset"
+        )
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.poll(session="x", count=0).status_code, 400)
+        self.assertEqual(self.poll(count=0).status_code, 400)
+
+
+class OhlcTests(TestCase):
+    def setUp(self):
+        origin = date.today() - timedelta(days=365)
+        provider = FixtureProvider(origin=origin, frequency="1min")
+        self.frame = provider.history("MIN", origin)
+        self.history = PriceHistory.from_frame(self.frame)
+
+    def test_minute_history_is_aggregated(self):
+        bars, positions = ohlc.visible_bars(self.history)
+        self.assertLessEqual(len(bars), ohlc.MAX_POINTS)
+        self.assertEqual(len(positions), len(bars))
+
+    def test_intraday_rules_match_pandas(self):
+        start = self.frame["Date"].iloc[-1] - timedelta(days=10)
+        bars, _ = ohlc.visible_bars(self.history, start)
+        expected = (
+            self.frame[self.frame["Date"] >= start]
+            .set_index("Date")
+            .resample("30min")
+            .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last"})
+            .dropna()
+        )
+        self.assertEqual(list(bars["Date"]), list(expected.index))
+        np.testing.assert_allclose(bars["Close"], expected["Close"], rtol=1e-6)
+
+    def test_compact_columns(self):
+        origin = date.today() - timedelta(days=365 * 50)
+        frame = FixtureProvider(origin=origin).history("DAY", origin)
+        daily = PriceHistory.from_frame(frame)
+        self.assertEqual(daily.index.dtype, np.uint16)
+        self.assertEqual(daily.nbytes, 18 * len(daily))
+        self.assertEqual(self.history.index.dtype, np.int32)
+        self.assertEqual(self.history.nbytes, 20 * len(self.history))
+        loaded = PriceHistory.from_bytes(daily.to_bytes())
+        np.testing.assert_array_equal(loaded.dates(), frame["Date"])
+        np.testing.assert_array_equal(loaded.columns["Close"], daily.columns["Close"])
+
+    def zoom(self, start, end):
+        return {"xaxis.range[0]": f"{start} 10:00:00", "xaxis.range[1]": end}
+
+    def test_daily_zoom_is_normalized(self):
+        day = self.frame["Date"].iloc[-1].normalize()
+        relayout = self.zoom(day.date(), f"{day.date()} 12:00:00")
+        self.assertEqual(ohlc.parse_relayout(relayout), (day, day))
+
+    def test_intraday_zoom_keeps_time_of_day(self):
+        days = self.frame["Date"].dt.normalize().unique()[-2:]
+        first, last = (pd.Timestamp(day).date() for day in days)
+        for start, end, bars in [(last, last, 121), (first, last, 360 + 151)]:
+            with self.subTest(start=start, end=end):
+                relayout = self.zoom(start, f"{end} 12:00:00")
+                visible = ohlc.parse_relayout(relayout, self.history.unit)
+                self.assertEqual(
+                    visible,
+                    (pd.Timestamp(f"{start} 10:00"), pd.Timestamp(f"{end} 12:00")),
+                )
+                shown, _ = ohlc.visible_bars(self.history, *visible)
+                self.assertEqual(len(shown), bars)
+                self.assertEqual(shown["Date"].iloc[0], visible[0])
+                self.assertEqual(shown["Date"].iloc[-1], visible[1])
+
+
+def pandas_indicator(name, params, closes):
+    """Columns of indicator ``name`` computed with pandas rolling and ewm."""
+    close = pd.Series(closes)
+    if name == "sma":
+        return {f"SMA {params[0]}": close.rolling(params[0]).mean()}
+    if name == "ema":
+        return {f"EMA {params[0]}": close.ewm(span=params[0], adjust=False).mean()}
+    if name == "bollinger":
+        window, width = params
+        middle = close.rolling(window).mean()
+        deviation = width * close.rolling(window).std(ddof=0)
+        return {
+            "BB upper": middle + deviation,
+            "BB lower": middle - deviation,
+            "BB middle": middle,
+        }
+    if name == "rsi":
+        (period,) = params
+        change = close.diff().iloc[1:]
+        gain = change.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+        loss = (-change).clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+        rsi = (100 - 100 / (1 + gain / loss)).where(loss != 0, 100.0)
+        rsi = rsi.reindex(close.index)
+        rsi.iloc[:period] = np.nan
+        return {f"RSI {period}": rsi}
+    fast, slow, signal = params
+    macd = (
+        close.ewm(span=fast, adjust=False).mean()
+        - close.ewm(span=slow, adjust=False).mean()
+    )
+    signal_line = macd.ewm(span=signal, adjust=False).mean()
+    return {"MACD": macd, "Signal": signal_line, "Histogram": macd - signal_line}
+
+
+class IndicatorParityTests(TestCase):
+    """Incremental extension, full computation and pandas agree for every preset."""
+
+    def setUp(self):
+        origin = date.today() - timedelta(days=3 * 365)
+        self.frame = FixtureProvider(origin=origin).history("PARITY", origin)
+        self.history = PriceHistory.from_frame(self.frame)
+        self.closes = self.history.columns["Close"].astype(np.float64)
+
+    def test_presets(self):
+        n = len(self.history)
+        # Appends of several bars, one bar and the rest, like daily updates.
+        lengths = [n - 40, n - 33, n - 32, n]
+        for preset, (name, params, _) in indicators.PRESETS.items():
+            with self.subTest(preset=preset):
+                cache = indicators.IndicatorCache()
+                for length in lengths:
+                    history = PriceHistory.from_frame(self.frame.iloc[:length])
+                    incremental = cache.get("PARITY", history, name, params)
+                self.assertEqual(cache.full, 1)
+                self.assertEqual(cache.incremental, len(lengths) - 1)
+                full, _ = indicators.get_indicator(name, params).compute(self.closes)
+                expected = pandas_indicator(name, params, self.closes)
+                self.assertEqual(set(incremental), set(expected))
+                for column, values in expected.items():
+                    np.testing.assert_allclose(
+                        incremental[column], full[column], rtol=1e-9, atol=1e-9
+                    )
+                    np.testing.assert_allclose(
+                        full[column], values.to_numpy(), rtol=1e-9, atol=1e-9
+                    )
+
+    def test_appends_in_place(self):
+        n = len(self.history)
+        cache = indicators.IndicatorCache()
+        histories = [
+            PriceHistory.from_frame(self.frame.iloc[:length])
+            for length in [n - 3, n - 2, n - 1, n]
+        ]
+        first = cache.get("PARITY", histories[0], "sma", (20,))["SMA 20"]
+        before = first.copy()
+        second = cache.get("PARITY", histories[1], "sma", (20,))["SMA 20"]
+        for history in histories[2:]:
+            latest = cache.get("PARITY", history, "sma", (20,))["SMA 20"]
+            # Later bars are written after the rows handed out so far.
+            self.assertTrue(np.shares_memory(latest, second))
+        self.assertEqual(len(latest), n)
+        np.testing.assert_array_equal(first, before)
+        # A shorter history branching off computes again, leaving views intact.
+        cache.get("PARITY", histories[1], "sma", (20,))
+        np.testing.assert_array_equal(latest[: n - 2], second)
+
+
+class ValuationTests(TestCase):
+    def setUp(self):
+        provider = FixtureProvider(origin="2020-01-02")
+        self.facts = compute_key_facts(
+            statements_by_year(provider.financials("GOOGL"), provider.cashflow("GOOGL"))
+        )
+
+    def test_net_debt(self):
+        self.assertEqual(valuation.net_debt({"totalDebt": 30, "totalCash": 50}), -20)
+        self.assertEqual(valuation.net_debt({"totalDebt": None}), 0)
+
+    def test_subtracts_net_debt(self):
+        shares = 1e9
+        plain = valuation.fair_value_distribution("GOOGL", self.facts, shares)
+        levered = valuation.fair_value_distribution(
+            "GOOGL", self.facts, shares, net_debt=5e9
+        )
+        self.assertAlmostEqual(plain["p50"] - levered["p50"], 5.0, places=6)
+
+    def test_panel_shows_the_assumptions(self):
+        text = json.dumps(dash_app.valuation_assumptions(), cls=PlotlyJSONEncoder)
+        multiple = valuation.ASSUMPTIONS["TERMINAL_MULTIPLE"]
+        self.assertIn(f"{multiple:g}x", text)
+        self.assertIn(f"{valuation.ASSUMPTIONS['DISCOUNT_RATE']:.0%}", text)
+
+
+def outage(status=None):
+    response = mock.Mock(status_code=status) if status else None
+    return requests.HTTPError("upstream failed", response=response)
+
+
+class Clock:
+    """Stand-in for ``time.monotonic`` that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(upstream.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = upstream.UpstreamClient(
+            rate=0, failure_threshold=3, reset_timeout=60, coalesce=0
+        )
+
+    def fail(self, exc):
+        def fetch():
+            raise exc
+
+        with self.assertRaises(type(exc)):
+            self.client.call("key", fetch)
+
+    def open_breaker(self):
+        for _ in range(3):
+            self.fail(outage(503))
+        self.assertTrue(self.client.breaker.is_open)
+
+    def test_opens_after_the_threshold(self):
+        self.fail(outage())
+        self.fail(outage(429))
+        self.assertFalse(self.client.breaker.is_open)
+        self.fail(outage(500))
+        fetch = mock.Mock()
+        with self.assertRaises(upstream.UpstreamUnavailable):
+            self.client.call("key", fetch)
+        fetch.assert_not_called()
+
+    def test_single_trial_after_the_reset_timeout(self):
+        self.open_breaker()
+        self.clock.now += 61
+        breaker = self.client.breaker
+        breaker.before_call()
+        # Only the first call after the timeout goes through.
+        with self.assertRaises(upstream.UpstreamUnavailable):
+            breaker.before_call()
+        breaker.success()
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(self.client.call("key", lambda: "ok"), "ok")
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        self.clock.now += 61
+        self.fail(outage(502))
+        self.assertTrue(self.client.breaker.is_open)
+        with self.assertRaises(upstream.UpstreamUnavailable):
+            self.client.call("key", lambda: "ok")
+        self.clock.now += 61
+        self.assertEqual(self.client.call("key", lambda: "ok"), "ok")
+
+    def test_other_errors_do_not_trip_it(self):
+        for _ in range(5):
+            self.fail(outage(404))
+            self.fail(KeyError("no such field"))
+        self.assertFalse(self.client.breaker.is_open)
+        self.assertEqual(self.client.breaker.failures, 0)
+
+
+class UpstreamClientTests(TestCase):
+    def test_concurrent_calls_share_the_exception(self):
+        client = upstream.UpstreamClient(rate=0, coalesce=0)
+        started = threading.Event()
+        waiting = threading.Event()
+        calls = []
+
+        class WatchedFuture(Future):
+            def result(self, timeout=None):
+                waiting.set()
+                return super().result(timeout)
+
+        def fetch():
+            calls.append(None)
+            started.set()
+            waiting.wait(5)
+            raise ValueError("bad payload")
+
+        errors = []
+
+        def call():
+            try:
+                client.call("key", fetch)
+            except ValueError as exc:
+                errors.append(exc)
+
+        with mock.patch.object(upstream, "Future", WatchedFuture):
+            threads = [threading.Thread(target=call) for _ in range(2)]
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            threads[1].start()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+        self.assertEqual(client._in_flight, {})
+
+    def test_coalesces_recent_results(self):
+        client = upstream.UpstreamClient(rate=0, coalesce=60)
+        fetch = mock.Mock(return_value="value")
+        client.call("key", fetch)
+        client.call("key", fetch)
+        fetch.assert_called_once()
+
+
+class YahooProviderTests(TestCase):
+    def setUp(self):
+        self.provider = YahooProvider(rate=0)
+        self.requests = []
+        data = mock.Mock(get_raw_json=self.get_raw_json)
+        patcher = mock.patch.object(YahooProvider, "_data", return_value=data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_raw_json(self, url, params):
+        self.requests.append(url)
+        if "quoteSummary" in url:
+            statistics = {"forwardEps": {"raw": 7.5}, "forwardPE": {"raw": 21.0}}
+            return {"quoteSummary": {"result": [{"defaultKeyStatistics": statistics}]}}
+        result = []
+        for name in params["type"].split(","):
+            dates = ["2023-06-30", "2023-12-31"]
+            values = [
+                {"asOfDate": d, "reportedValue": {"raw": i}}
+                for i, d in enumerate(dates)
+            ]
+            result.append({"meta": {"type": [name]}, name: values})
+        return {"timeseries": {"result": result}}
+
+    def test_statements_and_info_share_one_request(self):
+        financials = self.provider.financials("GOOGL")
+        cashflow = self.provider.cashflow("GOOGL")
+        info = self.provider.info("GOOGL")
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(list(financials["Total Revenue"]), [1, 0])
+        self.assertEqual(financials.index[0], pd.Timestamp("2023-12-31"))
+        self.assertIn("Free Cash Flow", cashflow)
+        self.assertEqual(
+            info,
+            {"symbol": "GOOGL", "sharesOutstanding": 1, "totalDebt": 1, "totalCash": 1},
+        )
+
+    def test_estimates_from_quote_summary(self):
+        estimates = self.provider.estimates("GOOGL")
+        self.assertEqual(estimates["forwardEps"], 7.5)
+        self.assertEqual(estimates["forwardPE"], 21.0)
+        self.assertEqual(len(self.requests), 1)
+        self.assertIn("quoteSummary", self.requests[0])
+
+
+class TokenBucketTests(TestCase):
+    def test_allows_a_burst_then_waits_for_tokens(self):
+        clock = Clock()
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock.now += seconds
+
+        with mock.patch.multiple(upstream.time, monotonic=clock, sleep=sleep):
+            bucket = upstream.TokenBucket(rate=2, burst=3)
+            for _ in range(3):
+                bucket.acquire()
+            self.assertEqual(sleeps, [])
+            bucket.acquire()
+            self.assertAlmostEqual(sum(sleeps), 0.5)
+            clock.now += 10
+            for _ in range(3):
+                bucket.acquire()
+            self.assertAlmostEqual(sum(sleeps), 0.5)
+
+
+class FlakyProvider(FixtureProvider):
+    """FixtureProvider whose calls fail while ``down`` is set."""
+
+    down = False
+
+    def info(self, ticker):
+        if self.down:
+            raise OSError("upstream is down")
+        return super().info(ticker)
+
+
+class MarketDataServiceTests(FixtureTestCase):
+    def service(self, provider):
+        service = MarketDataService(
+            self.cache_dir,
+            # Every refresh goes upstream.
+            ttl=0,
+            refresh_interval=60,
+            provider=provider,
+            cache_alias="tests",
+        )
+        service.background = False
+        return service
+
+    def test_serves_stale_copy_when_upstream_fails(self):
+        provider = FlakyProvider()
+        service = self.service(provider)
+        info = service.get("GOOGL", "info")
+        provider.down = True
+        self.assertEqual(service.refresh("GOOGL", "info"), info)
+        # Another process starts from the shared cache only.
+        self.assertEqual(self.service(provider).refresh("GOOGL", "info"), info)
+
+    def test_unavailable_without_a_copy(self):
+        provider = FlakyProvider()
+        provider.down = True
+        with self.assertRaises(MarketDataUnavailable):
+            self.service(provider).get("GOOGL", "info")
+
+
+class PreloadTests(FixtureTestCase):
+    def test_preload_starts_no_threads(self):
+        market_data = {**settings.MARKET_DATA, "PRELOAD_TICKERS": ["GOOGL"]}
+        running = set(threading.enumerate())
+        with override_settings(MARKET_DATA=market_data):
+            self.assertEqual(tickers.preload(), ["GOOGL"])
+            self.assertIsNone(get_service()._executor)
+        self.assertEqual(set(threading.enumerate()) - running, set())
+
+    def test_fetch_threads_are_recreated_after_a_fork(self):
+        service = get_service()
+        executor = service._fetch_executor()
+        self.assertIs(service._fetch_executor(), executor)
+        with mock.patch("os.getpid", return_value=-1):
+            self.assertIsNot(service._fetch_executor(), executor)
+        executor.shutdown()
+
+
+class FetchOnceTests(FixtureTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = caches["tests"]
+
+    def test_fetches_and_releases_the_lock(self):
+        fetch = mock.Mock(return_value="fetched")
+        value = shared_cache.fetch_once(self.cache, "key", fetch, lambda: None)
+        self.assertEqual(value, "fetched")
+        fetch.assert_called_once()
+        self.assertFalse(self.cache.has_key("key:fetching"))
+
+    def test_lock_holder_takes_a_result_stored_meanwhile(self):
+        fetch = mock.Mock()
+        value = shared_cache.fetch_once(self.cache, "key", fetch, lambda: "stored")
+        self.assertEqual(value, "stored")
+        fetch.assert_not_called()
+
+    def test_waits_for_the_other_process(self):
+        self.cache.add("key:fetching", 1)
+        results = iter([None, None, "theirs"])
+        fetch = mock.Mock()
+        with mock.patch.object(shared_cache, "POLL_INTERVAL", 0):
+            value = shared_cache.fetch_once(
+                self.cache, "key", fetch, lambda: next(results)
+            )
+        self.assertEqual(value, "theirs")
+        fetch.assert_not_called()
+
+    def test_waiter_takes_the_holders_frame(self):
+        frame = pd.DataFrame({"Close": [1.0, 2.0]})
+        stored = []
+        fetching = threading.Event()
+
+        def fetch():
+            fetching.set()
+            time.sleep(0.05)
+            stored.append(frame)
+            return frame
+
+        holder = threading.Thread(
+            target=shared_cache.fetch_once,
+            args=(self.cache, "key", fetch, lambda: stored[0] if stored else None),
+        )
+        holder.start()
+        self.assertTrue(fetching.wait(5))
+        polls = []
+
+        def lookup():
+            # The first poll misses the result just before the holder
+            # releases the lock, the last lookup after the loop finds it.
+            if not polls:
+                polls.append(None)
+                holder.join(5)
+                return None
+            return stored[0] if stored else None
+
+        waiter_fetch = mock.Mock()
+        with mock.patch.object(shared_cache, "POLL_INTERVAL", 0):
+            value = shared_cache.fetch_once(self.cache, "key", waiter_fetch, lookup)
+        self.assertIs(value, frame)
+        waiter_fetch.assert_not_called()
+
+    def test_fetches_after_waiting_too_long(self):
+        self.cache.add("key:fetching", 1)
+        with mock.patch.multiple(
+            shared_cache, POLL_INTERVAL=0, FETCH_LOCK_TIMEOUT=0.01
+        ):
+            value = shared_cache.fetch_once(
+                self.cache, "key", lambda: "mine", lambda: None
+            )
+        self.assertEqual(value, "mine")
+
+
+class ScreenerTests(FixtureTestCase):
+    def test_ticker_without_cost_of_revenue(self):
+        financials = FixtureProvider.financials
+
+        def no_cost_of_revenue(provider, ticker):
+            frame = financials(provider, ticker)
+            if ticker == "BANK":
+                frame = frame.drop(columns="Cost Of Revenue")
+            return frame
+
+        with mock.patch.object(FixtureProvider, "financials", no_cost_of_revenue):
+            table, errors = screener.screen(["GOOGL", "BANK"], processes=0)
+        self.assertEqual(errors, {})
+        bank = table.set_index("ticker").loc["BANK"]
+        self.assertTrue(np.isnan(bank["gross_margin"]))
+        self.assertFalse(np.isnan(bank["fcf_margin"]))
+
+    def test_one_bad_ticker_does_not_fail_the_chunk(self):
+        data, _ = screener.fetch_universe(["GOOGL", "AAPL"])
+        data["AAPL"]["financials"] = None
+        rows, errors = screener.compute_chunk(data)
+        self.assertEqual(list(rows["ticker"]), ["GOOGL"])
+        self.assertEqual(list(errors), ["AAPL"])
+
+
+class ScreenerApiTests(FixtureTestCase):
+    def test_screens_tickers(self):
+        response = self.client.get(
+            SCREENER_URL, {"tickers": "GOOGL,aapl", "sort": "ticker", "order": "asc"}
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([row["ticker"] for row in body["rows"]], ["AAPL", "GOOGL"])
+        self.assertEqual(body["errors"], {})
+        self.assertIn("fair_value", body["columns"])
+
+    def test_limit(self):
+        response = self.client.get(SCREENER_URL, {"tickers": "GOOGL,AAPL", "limit": 1})
+        self.assertEqual(len(response.json()["rows"]), 1)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(
+            self.client.get(SCREENER_URL, {"sort": "nope"}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(SCREENER_URL, {"tickers": "not a ticker"}).status_code,
+            400,
+        )
+        too_many = ",".join(f"T{i}" for i in range(50))
+        self.assertEqual(
+            self.client.get(SCREENER_URL, {"tickers": too_many}).status_code, 400
+        )
+
+    def test_no_saved_run(self):
+        self.assertEqual(self.client.get(SCREENER_URL).status_code, 404)
+
+
+@override_settings(METRICS={"ENABLED": True, "TOKEN": ""})
+class MetricsTests(FixtureTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        self.addCleanup(metrics.registry.clear)
+
+    def post_callback(self, body, app="google_dashboard"):
+        # Bad requests fail inside django_plotly_dash, answer them with a 500.
+        self.client.raise_request_exception = False
+        return self.client.post(
+            f"/django_plotly_dash/app/{app}/_dash-update-component",
+            json.dumps(body),
+            content_type="application/json",
+        )
+
+    def test_labels_only_registered_callbacks(self):
+        body = plot_callback_body("GOOGL")
+        self.assertEqual(self.post_callback(body).status_code, 200)
+        self.assertIn(f'callback="{body["output"]}"', metrics.registry.render())
+        request = mock.Mock(body=json.dumps({**body, "output": "made.up"}))
+        self.assertEqual(
+            metrics._callback_name(request, "update-component", dash_app.app),
+            metrics.UNKNOWN,
+        )
+
+    def test_skips_failed_responses(self):
+        body = plot_callback_body("GOOGL")
+        self.assertEqual(self.post_callback(body, app="no_such_app").status_code, 500)
+        self.post_callback({**body, "output": "made.up"})
+        rendered = metrics.registry.render()
+        self.assertNotIn("no_such_app", rendered)
+        self.assertNotIn("made.up", rendered)
+
+    def test_endpoint_is_local_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.assertEqual(
+            self.client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code, 403
+        )
+
+    @override_settings(METRICS={"TOKEN": "secret"})
+    def test_endpoint_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get(
+            "/metrics",
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_AUTHORIZATION="Bearer secret",
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,200 @@
+"""
+Per-ticker computations for the financials dashboard.
+
+A :class:`TickerData` holds the market data and derived key facts of one
+symbol. :func:`get_ticker_data` serves them from a bounded LRU cache, so the
+most viewed tickers stay in memory and a cold ticker is loaded once no matter
+how many requests ask for it at the same time.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from google_financials_dashboard.key_facts import (
+    CAGR_YEARS,
+    compute_key_facts,
+    latest,
+    statements_by_year,
+)
+from google_financials_dashboard.market_data import DATASETS, get_service
+from google_financials_dashboard.valuation import fair_value_distribution, net_debt
+from jhonatan_projects.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICKERS = ["GOOGL", "AAPL", "MSFT", "AMZN", "META", "NFLX", "NVDA", "TSLA"]
+DEFAULT_CACHE_SIZE = 20
+
+TICKER_RE = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,9}$")
+
+
+def normalize_ticker(ticker):
+    """Upper-case ``ticker`` and reject anything that is not a plain symbol."""
+    ticker = (ticker or "").strip().upper()
+    if not TICKER_RE.match(ticker):
+        raise ValueError(f"invalid ticker {ticker!r}")
+    return ticker
+
+
+class TickerData:
+    """Market data and key facts of a single ticker."""
+
+    def __init__(self, ticker, history, financials, cashflow, info, version=0):
+        self.ticker = ticker
+        self.history = history
+        self.info = info
+        self.version = version
+
+        self.facts = compute_key_facts(statements_by_year(financials, cashflow))
+        last = latest(self.facts)
+        self.year = last.name
+        self.cagr = last[f"revenue_cagr_{CAGR_YEARS[0]}y"]
+        self.ltm_gm = last["gross_margin"]
+        self.ltm_fcf = last["fcf_margin"]
+
+        # P10/P50/P90 per share, None without statements or share count.
+        self.valuation = fair_value_distribution(
+            ticker,
+            self.facts,
+            info.get("sharesOutstanding"),
+            net_debt=net_debt(info),
+        )
+        self.fair_value = self.valuation["p50"] if self.valuation else None
+
+    @classmethod
+    async def aload(cls, ticker):
+        """Load ``ticker``, fetching its independent datasets concurrently."""
+        service = get_service()
+        datasets = await asyncio.gather(
+            *(service.aget(ticker, dataset) for dataset in DATASETS)
+        )
+        return cls(ticker, *datasets, version=service.version(ticker))
+
+    @classmethod
+    def load(cls, ticker, concurrent=True):
+        """Load ``ticker``, one dataset after the other unless ``concurrent``."""
+        if concurrent:
+            return async_to_sync(cls.aload)(ticker)
+        service = get_service()
+        datasets = [service.get(ticker, dataset) for dataset in DATASETS]
+        return cls(ticker, *datasets, version=service.version(ticker))
+
+
+class TickerCache:
+    """Thread-safe LRU of :class:`TickerData` with single-flight loading."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, ticker, concurrent=True):
+        ticker = normalize_ticker(ticker)
+        # 0 once the service forgot the ticker: reload through it, so its
+        # datasets are tracked and refreshed again.
+        version = get_service().version(ticker)
+        with self._lock:
+            item = self._items.get(ticker)
+            if item is not None and version and item.version >= version:
+                self._items.move_to_end(ticker)
+                return item
+            load_lock = self._loading.setdefault(ticker, threading.Lock())
+
+        with load_lock:
+            try:
+                # A load that finished while we waited left a newer version.
+                version = get_service().version(ticker)
+                with self._lock:
+                    item = self._items.get(ticker)
+                    if item is not None and version and item.version >= version:
+                        self._items.move_to_end(ticker)
+                        return item
+                item = TickerData.load(ticker, concurrent)
+            finally:
+                # Also after a failed load, so the next caller retries.
+                with self._lock:
+                    if self._loading.get(ticker) is load_lock:
+                        del self._loading[ticker]
+            with self._lock:
+                self._items[ticker] = item
+                self._items.move_to_end(ticker)
+                evicted = []
+                while len(self._items) > self.maxsize:
+                    evicted.append(self._items.popitem(last=False)[0])
+        for old in evicted:
+            # Its datasets would otherwise stay in memory and be refreshed.
+            get_service().forget(old)
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ticker_data(ticker, concurrent=True):
+    """Return the cached :class:`TickerData` of ``ticker``, loading it if needed.
+
+    ``concurrent`` fetches its datasets in parallel on the service's threads.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, "MARKET_DATA", {})
+                _cache = TickerCache(config.get("TICKER_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    with stage("data"):
+        return _cache.get(ticker, concurrent)
+
+
+async def aget_ticker_data(ticker):
+    """Async :func:`get_ticker_data`, run in a worker thread off the event loop."""
+    return await sync_to_async(get_ticker_data, thread_sensitive=False)(ticker)
+
+
+@receiver(setting_changed)
+def _reset_cache(setting, **kwargs):
+    global _cache
+    if setting == "MARKET_DATA":
+        _cache = None
+
+
+def available_tickers():
+    """Tickers offered in the dashboard dropdown."""
+    return list(getattr(settings, "MARKET_DATA", {}).get("TICKERS", DEFAULT_TICKERS))
+
+
+def preload():
+    """Load ``MARKET_DATA['PRELOAD_TICKERS']`` into the cache, skipping failures.
+
+    Run in the server's master process before workers are forked, so that the
+    loaded frames are shared copy-on-write instead of fetched once per worker.
+    """
+    tickers = getattr(settings, "MARKET_DATA", {}).get("PRELOAD_TICKERS", [])
+    service = get_service()
+    # No refresh or fetch threads in the parent, threads do not survive a fork.
+    service.background = False
+    loaded = []
+    try:
+        for ticker in tickers:
+            try:
+                get_ticker_data(ticker, concurrent=False)
+            except Exception:
+                logger.exception("Could not preload %s", ticker)
+            else:
+                loaded.append(ticker)
+    finally:
+        service.background = True
+    return loaded
@@ -0,0 +1,203 @@
+"""
+Client layer for the calls the dashboard makes to an upstream data source.
+
+Every call of :class:`~google_financials_dashboard.providers.YahooProvider`
+goes through one :class:`UpstreamClient`:
+
+* one pooled keep-alive ``requests`` session, so Yahoo's cookie and crumb
+  handshake and the TLS connections are made once per process,
+* deduplication: a call identical to one in flight waits for its result, and
+  a result is reused for ``coalesce`` seconds, so datasets that come from the
+  same upstream response cost one request,
+* a token bucket that caps the request rate across threads, allowing short
+  bursts, so the provider stops throttling us,
+* a circuit breaker that fails fast after consecutive errors and lets a single
+  trial call through once ``reset_timeout`` seconds have passed. The market
+  data service then keeps serving its last good copies.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+def is_outage(exc):
+    """Whether ``exc`` means upstream is down or throttling us.
+
+    Other errors, e.g. a 404 for an unknown ticker, do not trip the breaker.
+    """
+    import requests
+
+    if not isinstance(exc, requests.RequestException):
+        return False
+    status = getattr(exc.response, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+class TokenBucket:
+    """Allow ``rate`` calls per second on average and ``burst`` at once."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures.
+
+    While open, calls are refused for ``reset_timeout`` seconds. After that a
+    single trial call is let through: success closes the circuit again, failure
+    keeps it open for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        """Raise :class:`UpstreamUnavailable` unless a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise UpstreamUnavailable(
+                    f"upstream failed {self.failures} times in a row, "
+                    f"retrying in {max(remaining, 0):.0f}s"
+                )
+            self._trial = True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class UpstreamClient:
+    """Shared session, deduplication, rate limiting and circuit breaking."""
+
+    def __init__(
+        self,
+        rate=2.0,
+        burst=5,
+        failure_threshold=5,
+        reset_timeout=60,
+        pool_size=32,
+        coalesce=60,
+    ):
+        self.pool_size = pool_size
+        self.coalesce = coalesce
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.calls = 0
+        self._session = None
+        self._in_flight = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The keep-alive session all upstream requests share."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=4, pool_maxsize=self.pool_size
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def call(self, key, fetch):
+        """Result of ``fetch()``, shared by every call with the same ``key``."""
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] > now:
+                return recent[1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = self._call(fetch)
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self._remember(key, value)
+        future.set_result(value)
+        return value
+
+    def _call(self, fetch):
+        self.breaker.before_call()
+        self.bucket.acquire()
+        with self._lock:
+            self.calls += 1
+        try:
+            value = fetch()
+        except Exception as exc:
+            if is_outage(exc):
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+            raise
+        self.breaker.success()
+        return value
+
+    def _remember(self, key, value):
+        if not self.coalesce:
+            return
+        now = time.monotonic()
+        self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+        self._recent[key] = (now + self.coalesce, value)
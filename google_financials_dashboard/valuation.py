@@ -0,0 +1,149 @@
+"""
+Monte Carlo discounted cash flow valuation.
+
+Free cash flow is projected from the latest revenue at the ticker's average
+FCF margin of the last years. Revenue grows at a first-stage rate for five
+years, then at ``FADE`` times that rate for five more, and the year-ten cash
+flow is capitalized at a terminal multiple. The first-stage growth is drawn
+around the historical revenue CAGR with the spread of the yearly growth
+rates, and the discount rate around ``DISCOUNT_RATE``. The present value of
+every path, less the ticker's net debt, per share gives the fair value
+distribution, summarized by its 10th, 50th and 90th percentiles.
+
+With a growth and discount rate constant per stage, each stage's discounted
+cash flows form a geometric series. A path is then a handful of vectorized
+operations on arrays of one value per path, whatever the horizon. 100,000
+paths take 10-20 ms, mostly drawing the random numbers and percentiles.
+"""
+
+import zlib
+
+import numpy as np
+
+PATHS = 100_000
+
+ASSUMPTIONS = {
+    # Years at the first-stage growth rate, then at FADE times that rate.
+    "STAGE_YEARS": 5,
+    "FADE": 0.75,
+    "TERMINAL_MULTIPLE": 15.0,
+    "DISCOUNT_RATE": 0.10,
+    "DISCOUNT_RATE_SIGMA": 0.015,
+    "MIN_DISCOUNT_RATE": 0.04,
+    # Spread of the growth rate when fewer than two yearly rates are known,
+    # and the least spread assumed otherwise.
+    "GROWTH_SIGMA": 0.05,
+    "MIN_GROWTH_SIGMA": 0.02,
+    "GROWTH_RANGE": (-0.5, 1.0),
+    # Years averaged for the FCF margin.
+    "MARGIN_YEARS": 3,
+}
+
+PERCENTILES = (10, 50, 90)
+
+
+def _geometric(ratio, n):
+    """``(ratio + ratio**2 + ... + ratio**n, ratio**n)`` element-wise."""
+    power = ratio.copy()
+    total = ratio.copy()
+    for _ in range(n - 1):
+        power *= ratio
+        total += power
+    return total, power
+
+
+def dcf_inputs(facts, assumptions=ASSUMPTIONS):
+    """``(revenue, fcf_margin, growth, growth_sigma)`` from yearly key facts,
+    or ``None`` without revenue and free cash flow.
+    """
+    years = facts.dropna(subset=["revenue", "free_cash_flow"])
+    if years.empty:
+        return None
+    revenue = float(years["revenue"].iloc[-1])
+    margin = float(years["fcf_margin"].iloc[-assumptions["MARGIN_YEARS"] :].mean())
+    growth_rates = facts["revenue_growth"].dropna()
+    span = years.index[-1] - years.index[0]
+    if span > 0 and years["revenue"].iloc[0] > 0 and revenue > 0:
+        growth = (revenue / years["revenue"].iloc[0]) ** (1 / span) - 1
+    else:
+        growth = 0.0
+    if len(growth_rates) >= 2:
+        sigma = max(float(growth_rates.std()), assumptions["MIN_GROWTH_SIGMA"])
+    else:
+        sigma = assumptions["GROWTH_SIGMA"]
+    return revenue, margin, float(growth), sigma
+
+
+def simulate(
+    revenue,
+    margin,
+    growth,
+    growth_sigma,
+    shares,
+    paths=PATHS,
+    seed=0,
+    assumptions=ASSUMPTIONS,
+    net_debt=0.0,
+):
+    """Fair value per share of ``paths`` simulated cash flow paths.
+
+    ``net_debt`` is subtracted from the value of the cash flows, net cash is
+    a negative net debt.
+    """
+    rng = np.random.default_rng(seed)
+    low, high = assumptions["GROWTH_RANGE"]
+    g1 = np.clip(rng.normal(growth, growth_sigma, paths), low, high)
+    g2 = g1 * assumptions["FADE"]
+    rate = np.maximum(
+        rng.normal(
+            assumptions["DISCOUNT_RATE"], assumptions["DISCOUNT_RATE_SIGMA"], paths
+        ),
+        assumptions["MIN_DISCOUNT_RATE"],
+    )
+    n = assumptions["STAGE_YEARS"]
+    # Discounted growth factor per year of each stage.
+    first, first_n = _geometric((1 + g1) / (1 + rate), n)
+    second, second_n = _geometric((1 + g2) / (1 + rate), n)
+    present = first + first_n * second
+    terminal = first_n * second_n * assumptions["TERMINAL_MULTIPLE"]
+    equity = revenue * margin * (present + terminal) - net_debt
+    # Shareholders cannot lose more than their equity.
+    return np.maximum(equity, 0) / shares
+
+
+def _seed(ticker):
+    # Stable across processes, so every worker shows the same distribution.
+    return zlib.crc32(ticker.upper().encode())
+
+
+def net_debt(info):
+    """Total debt less cash from a ticker's info, 0 for what is not reported."""
+    total = 0.0
+    for key, sign in (("totalDebt", 1), ("totalCash", -1)):
+        try:
+            value = float(info.get(key) or 0)
+        except (TypeError, ValueError):
+            continue
+        if np.isfinite(value):
+            total += sign * value
+    return total
+
+
+def fair_value_distribution(
+    ticker, facts, shares, paths=PATHS, assumptions=ASSUMPTIONS, net_debt=0.0
+):
+    """``{"p10", "p50", "p90"}`` fair value per share of ``ticker``, or
+    ``None`` when its statements or share count are missing.
+    """
+    try:
+        shares = float(shares)
+    except (TypeError, ValueError):
+        return None
+    inputs = dcf_inputs(facts, assumptions)
+    if inputs is None or not shares > 0 or not np.isfinite(inputs).all():
+        return None
+    values = simulate(*inputs, shares, paths, _seed(ticker), assumptions, net_debt)
+    return {
+        f"p{q}": float(v)
+        for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
@@ -1,5 +1,103 @@
+import json
+
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+from django_plotly_dash import views as dash_views
+
+from google_financials_dashboard.dash_apps import dash_app
+from google_financials_dashboard.layout_cache import get_layout_cache
+from google_financials_dashboard.live import last_close, next_message
+from google_financials_dashboard.market_data import MarketDataUnavailable
+from google_financials_dashboard.screener import COLUMNS, load_result, screen
+from google_financials_dashboard.tickers import get_ticker_data, normalize_ticker
+from jhonatan_projects.page_cache import cached_page
+
+# Tickers a single API request may screen on the fly.
+MAX_API_TICKERS = 20
+
 
 # Create your views here.
+@require_safe
+@cached_page
 def render_google_project(request):
     return render(request,"dashboard.html")
+
+
+@require_safe
+def dash_layout(request, ident, stateless=False):
+    """django_plotly_dash's layout view, served from the layout cache.
+
+    Only the dashboard app is cached, any other app goes to the original view.
+    """
+    if ident != dash_app.app._uid:
+        return dash_views.layout(request, ident, stateless)
+    cache = get_layout_cache()
+    version = dash_app.layout_version()
+    entry = cache.get(version)
+    if entry is None:
+        response = dash_views.layout(request, ident, stateless)
+        if response.status_code != 200:
+            return response
+        entry = cache.set(version, response)
+    return entry.response(request)
+
+
+@require_safe
+def screener(request):
+    """Screener table as JSON.
+
+    ``?tickers=A,B`` screens those tickers now, otherwise the last run saved by
+    ``manage.py screen --save`` is returned. ``sort``, ``order`` (``asc`` or
+    ``desc``) and ``limit`` shape the rows.
+    """
+    sort = request.GET.get("sort", "fair_value")
+    if sort not in COLUMNS:
+        return JsonResponse({"error": f"sort must be one of {COLUMNS}"}, status=400)
+    try:
+        limit = int(request.GET["limit"]) if "limit" in request.GET else None
+        tickers = [
+            normalize_ticker(t) for t in request.GET.get("tickers", "").split(",") if t
+        ]
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if len(tickers) > MAX_API_TICKERS:
+        return JsonResponse(
+            {"error": f"at most {MAX_API_TICKERS} tickers per request"}, status=400
+        )
+
+    errors = {}
+    if tickers:
+        table, errors = screen(tickers, processes=0)
+    else:
+        table = load_result()
+        if table is None:
+            return JsonResponse({"error": "no screener run saved yet"}, status=404)
+    table = table.sort_values(
+        sort, ascending=request.GET.get("order") == "asc", ignore_index=True
+    )
+    if limit is not None:
+        table = table.head(limit)
+    rows = json.loads(table.to_json(orient="records"))
+    return JsonResponse({"columns": COLUMNS, "rows": rows, "errors": errors})
+
+
+@require_safe
+def live_bars(request, ticker):
+    """Next live mode update as JSON, polled by browsers without websockets.
+
+    Takes the ``session`` and ``count`` of bars shown, like the websocket of
+    :class:`~google_financials_dashboard.consumers.LiveBarsConsumer`.
+    """
+    try:
+        ticker = normalize_ticker(ticker)
+        session = int(request.GET["session"])
+        count = int(request.GET["count"])
+    except (KeyError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    try:
+        ticker_data = get_ticker_data(ticker)
+    except MarketDataUnavailable as exc:
+        return JsonResponse({"error": str(exc)}, status=503)
+    message = next_message(ticker, last_close(ticker_data), session, count)
+    return JsonResponse(message or {"type": "wait"})
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for serving jhonatan_projects in production.
+
+    gunicorn -c gunicorn.conf.py jhonatan_projects.wsgi:application
+
+or, on the async path, where one worker multiplexes many slow requests:
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c gunicorn.conf.py jhonatan_projects.asgi:application
+
+Workers and threads are read from the environment (WEB_CONCURRENCY,
+GUNICORN_THREADS; threads only apply to the gthread worker). The application is imported once in the master process and
+the tickers in MARKET_DATA["PRELOAD_TICKERS"] are loaded before forking, so
+every worker starts with the Dash app and its market data already in memory,
+shared copy-on-write.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+keepalive = 5
+preload_app = True
+accesslog = "-"
+
+
+def when_ready(server):
+    from google_financials_dashboard.tickers import preload
+
+    loaded = preload()
+    server.log.info("Preloaded market data for %s", ", ".join(loaded) or "no tickers")
+    # Move everything allocated so far out of the collector's reach, so garbage
+    # collection in the workers does not touch (and copy) the shared pages.
+    gc.freeze()
@@ -0,0 +1,230 @@
+"""
+Timing and payload metrics of Dash requests served through django_plotly_dash.
+
+:class:`DashMetricsMiddleware` measures every layout and callback request per
+Dash app and callback. Code on the hot path marks its data access, figure
+building and JSON encoding with :func:`stage`, and the time spent in each stage
+is recorded next to the total and the response size. The numbers are exposed
+in the Prometheus text format by :func:`metrics_view` and, when
+``METRICS["SERVER_TIMING"]`` is on, in a ``Server-Timing`` response header.
+
+Metrics live in process memory: with several gunicorn workers, every scrape
+reports the worker that happened to answer it. Only successful responses are
+recorded, and only under the names of registered apps and callbacks, so
+arbitrary requests cannot grow the number of series.
+"""
+
+import contextvars
+import ipaddress
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SERVER_TIMING": False,
+    # Bearer token required by the metrics endpoint. Without one, it only
+    # answers requests from the loopback interface.
+    "TOKEN": "",
+}
+
+UNKNOWN = "unknown"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# django_plotly_dash route names (without the "app-" and "--args" variants).
+DASH_ROUTES = {"update-component", "layout"}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    """Thread-safe store of the Dash request metrics."""
+
+    def __init__(self):
+        self._durations = {}
+        self._bytes = {}
+        self._lock = threading.Lock()
+
+    def record(self, app, callback, durations, size):
+        with self._lock:
+            for name, seconds in durations.items():
+                key = (app, callback, name)
+                self._durations.setdefault(key, Histogram()).observe(seconds)
+            total = self._bytes.setdefault((app, callback), [0, 0])
+            total[0] += 1
+            total[1] += size
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+            self._bytes.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP dash_request_duration_seconds Time spent per Dash request stage.",
+            "# TYPE dash_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (app, callback, name), histogram in sorted(self._durations.items()):
+                labels = (
+                    f'app="{_escape(app)}",callback="{_escape(callback)}",'
+                    f'stage="{name}"'
+                )
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(
+                        f'dash_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                        f"{count}"
+                    )
+                lines.append(
+                    f'dash_request_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                    f"{histogram.count}"
+                )
+                lines.append(
+                    f"dash_request_duration_seconds_sum{{{labels}}} {histogram.sum}"
+                )
+                lines.append(
+                    f"dash_request_duration_seconds_count{{{labels}}} {histogram.count}"
+                )
+            lines += [
+                "# HELP dash_response_bytes Size of Dash response bodies.",
+                "# TYPE dash_response_bytes summary",
+            ]
+            for (app, callback), (count, size) in sorted(self._bytes.items()):
+                labels = f'app="{_escape(app)}",callback="{_escape(callback)}"'
+                lines.append(f"dash_response_bytes_sum{{{labels}}} {size}")
+                lines.append(f"dash_response_bytes_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+_stages = contextvars.ContextVar("dash_metrics_stages", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to stage ``name`` of the current request."""
+    durations = _stages.get()
+    if durations is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations[name] = durations.get(name, 0.0) + time.perf_counter() - start
+
+
+def _dash_app(ident):
+    """The registered stateless Dash app ``ident``, or ``None``."""
+    from django_plotly_dash.dash_wrapper import all_apps
+
+    return all_apps().get(ident)
+
+
+def _callback_ids(app):
+    """Output ids of the server-side callbacks of ``app``, as Dash names them."""
+    from dash._utils import create_callback_id
+
+    return {
+        create_callback_id(callback["output"], callback["inputs"])
+        for callback, _ in app._callback_sets
+    }
+
+
+def _callback_name(request, route, app):
+    if route == "layout":
+        return "_dash-layout"
+    try:
+        output = json.loads(request.body)["output"]
+    except (ValueError, KeyError, TypeError):
+        return UNKNOWN
+    return output if output in _callback_ids(app) else UNKNOWN
+
+
+class DashMetricsMiddleware:
+    """Record stage timings and response size of django_plotly_dash requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = _config()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+        durations = {}
+        token = _stages.set(durations)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stages.reset(token)
+        durations["total"] = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.url_name if match else None
+        if route:
+            route = route.removeprefix("app-").removesuffix("--args")
+        if route not in DASH_ROUTES or response.status_code >= 400:
+            return response
+        ident = match.kwargs.get("ident")
+        app = _dash_app(ident)
+        if app is None:
+            return response
+        size = 0 if response.streaming else len(response.content)
+        registry.record(ident, _callback_name(request, route, app), durations, size)
+        if config["SERVER_TIMING"]:
+            response["Server-Timing"] = ", ".join(
+                f"{name};dur={seconds * 1000:.1f}"
+                for name, seconds in durations.items()
+            )
+        return response
+
+
+def _is_loopback(address):
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    token = _config()["TOKEN"]
+    if token:
+        if request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponseForbidden()
+    elif not _is_loopback(request.META.get("REMOTE_ADDR", "")):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,160 @@
+"""
+Full-page response cache for views that always render the same HTML.
+
+Rendered pages are kept in an in-process LRU and, if ``PAGE_CACHE["DIR"]`` is
+set, in a file-backed cache that survives restarts and is shared by workers.
+Responses carry an ``ETag`` and ``Last-Modified`` so browsers can revalidate
+and get a ``304 Not Modified`` instead of the body.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 64,
+    "DIR": None,
+    "MAX_AGE": 0,
+    "VERSION": 1,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "PAGE_CACHE", {})}
+
+
+class PageCache:
+    """LRU of rendered pages with an optional file-backed second level."""
+
+    def __init__(self, max_entries, directory=None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                return entry
+        entry = self._read_file(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        self._remember(key, entry)
+        self._write_file(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def _path(self, key):
+        return self.directory / hashlib.sha1(key.encode()).hexdigest()
+
+    def _read_file(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path.with_suffix(".json"), encoding="utf-8") as fh:
+                entry = json.load(fh)
+            entry["body"] = path.with_suffix(".body").read_bytes()
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.exception("Discarding unreadable page cache entry for %s", key)
+            return None
+
+    def _write_file(self, key, entry):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        meta = {k: v for k, v in entry.items() if k != "body"}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Body first: a reader only trusts the body once the metadata exists.
+            files = ((".body", entry["body"]), (".json", json.dumps(meta).encode()))
+            for suffix, content in files:
+                tmp = path.with_suffix(f"{suffix}.{os.getpid()}.tmp")
+                tmp.write_bytes(content)
+                os.replace(tmp, path.with_suffix(suffix))
+        except OSError:
+            logger.exception("Could not write page cache entry %s", path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = _config()
+                _cache = PageCache(config["MAX_ENTRIES"], config["DIR"])
+    return _cache
+
+
+def _response(request, entry, max_age):
+    response = get_conditional_response(
+        request, etag=entry["etag"], last_modified=entry["last_modified"]
+    )
+    if response is None:
+        response = HttpResponse(entry["body"], content_type=entry["content_type"])
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    patch_cache_control(response, max_age=max_age, must_revalidate=True)
+    return response
+
+
+def cached_page(view):
+    """Serve ``view`` from the page cache, keyed by request path."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        config = _config()
+        if not config["ENABLED"] or request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        key = f"v{config['VERSION']}:{request.path}"
+        cache = get_page_cache()
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            entry = {
+                "body": response.content,
+                "content_type": response["Content-Type"],
+                "etag": '"%s"' % hashlib.sha1(response.content).hexdigest(),
+                "last_modified": int(time.time()),
+            }
+            cache.set(key, entry)
+        return _response(request, entry, config["MAX_AGE"])
+
+    return wrapper
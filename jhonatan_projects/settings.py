@@ -47,12 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'jhonatan_projects.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'jhonatan_projects.metrics.DashMetricsMiddleware',
     'django_plotly_dash.middleware.BaseMiddleware',
     'django_plotly_dash.middleware.ExternalRedirectionMiddleware',
 ]
@@ -74,6 +76,80 @@ PLOTLY_DASH = {
 
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# The market_data cache holds the datasets and figures of the financials
+# dashboard for all workers. The file-based default is shared by the workers of
+# one instance. To share it between instances, point it at Redis with
+# MARKET_DATA_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# MARKET_DATA_CACHE_LOCATION=redis://host:6379/0 (needs the redis package).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'market_data': {
+        'BACKEND': os.environ.get(
+            'MARKET_DATA_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.environ.get(
+            'MARKET_DATA_CACHE_LOCATION', os.path.join('/tmp', 'market_data_cache')
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+        'KEY_PREFIX': 'financials',
+    },
+}
+
+# Market data for the financials dashboard is fetched lazily and cached.
+# App Engine only allows writes under /tmp, which is the default location.
+MARKET_DATA = {
+    "CACHE_DIR": os.environ.get("MARKET_DATA_CACHE_DIR", os.path.join("/tmp", "market_data")),
+    "CACHE": "market_data",  # alias in CACHES shared by the workers
+    # Memory-map price histories from CACHE_DIR, so workers share one copy.
+    "MMAP_HISTORY": os.environ.get("MARKET_DATA_MMAP", "") == "1",
+    "TTL": 24 * 60 * 60,  # seconds before a dataset is refreshed in the background
+    "REFRESH_INTERVAL": 15 * 60,
+    "TICKERS": ["GOOGL", "AAPL", "MSFT", "AMZN", "META", "NFLX", "NVDA", "TSLA"],
+    "TICKER_CACHE_SIZE": 20,  # tickers whose computations stay in memory
+    "PRELOAD_TICKERS": ["GOOGL"],  # loaded before gunicorn forks its workers
+    # Where the data comes from. FixtureProvider works offline: it replays
+    # recorded fixtures from OPTIONS["directory"] or generates synthetic data.
+    "PROVIDER": {
+        "BACKEND": os.environ.get(
+            "MARKET_DATA_PROVIDER", "google_financials_dashboard.providers.YahooProvider"
+        ),
+        "OPTIONS": {},
+    },
+}
+
+METRICS = {
+    "ENABLED": True,
+    # Add a Server-Timing header with the stage timings to Dash responses.
+    "SERVER_TIMING": os.environ.get("SERVER_TIMING", "") == "1",
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+}
+
+FINANCIALS_DASHBOARD = {
+    # Ship long figure arrays as base64 typed arrays instead of JSON lists.
+    # Off, figures of at most 600 bars only get 1.3 to 1.4x smaller.
+    "BINARY_FIGURES": False,
+    # Embed the default ticker's figures in the layout instead of fetching
+    # them with the initial callbacks.
+    "PRERENDER": True,
+    # Seconds the error layout is reused when the default ticker cannot load.
+    "RETRY_AFTER": 30,
+    # Wall time in seconds of one minute of the simulated live session.
+    "LIVE_INTERVAL": float(os.environ.get("LIVE_INTERVAL", 1.0)),
+}
+
+# Full-page cache for the fixed project pages, see jhonatan_projects/page_cache.py.
+PAGE_CACHE = {
+    "MAX_ENTRIES": 64,
+    # Optional file-backed level shared by workers, e.g. "/tmp/page_cache".
+    "DIR": os.environ.get("PAGE_CACHE_DIR"),
+    "MAX_AGE": 0,  # browsers always revalidate, unchanged pages answer 304
+    "VERSION": 1,  # bump to invalidate cached pages after template changes
+}
+
 ROOT_URLCONF = 'jhonatan_projects.urls'
 
 TEMPLATES = [
@@ -93,6 +169,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'jhonatan_projects.wsgi.application'
+ASGI_APPLICATION = 'jhonatan_projects.asgi.application'
 
 
 # Database
@@ -152,6 +229,17 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",  # Ruta de archivos estáticos de la aplicación en desarrollo
 ]
 
+# collectstatic writes content-hashed files plus .gz/.br and WebP/AVIF variants;
+# StaticFilesMiddleware serves the hashed ones with immutable cache headers.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "jhonatan_projects.staticfiles.StaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
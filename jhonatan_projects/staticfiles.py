@@ -0,0 +1,114 @@
+"""
+Static file storage and serving for jhonatan_projects.
+
+``collectstatic`` writes content-hashed copies of every file together with
+gzip and brotli variants (via WhiteNoise), and additionally transcodes large
+PNG images to WebP (and AVIF when Pillow supports it). The middleware serves
+the hashed files with far-future immutable cache headers and picks the best
+image format the browser advertises in its ``Accept`` header.
+"""
+
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+logger = logging.getLogger(__name__)
+
+# PNGs smaller than this are left alone, the saving is not worth a variant.
+TRANSCODE_MIN_SIZE = 32 * 1024
+
+# (file extension, Pillow format, mime type, save options), preferred first.
+IMAGE_VARIANTS = [
+    (".avif", "AVIF", "image/avif", {"quality": 60}),
+    (".webp", "WEBP", "image/webp", {"quality": 80, "method": 6}),
+]
+
+
+def _supported_variants():
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    Image.init()
+    return [v for v in IMAGE_VARIANTS if v[1] in Image.SAVE]
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, precompressed static files with modern-format image variants."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        variants = _supported_variants()
+        if not variants:
+            return
+        for name, hashed_name in list(self.hashed_files.items()):
+            if not name.lower().endswith(".png") or name == hashed_name:
+                continue
+            if self.size(hashed_name) < TRANSCODE_MIN_SIZE:
+                continue
+            for variant_name, variant_hashed in self._transcode(
+                name, hashed_name, variants
+            ):
+                self.hashed_files[variant_name] = variant_hashed
+                yield variant_name, variant_hashed, True
+        self.save_manifest()
+
+    def _transcode(self, name, hashed_name, variants):
+        from PIL import Image
+
+        with self.open(hashed_name) as fh:
+            image = Image.open(io.BytesIO(fh.read()))
+            image.load()
+        original_size = self.size(hashed_name)
+        for extension, image_format, _, save_options in variants:
+            buffer = io.BytesIO()
+            try:
+                image.save(buffer, image_format, **save_options)
+            except (OSError, ValueError):
+                logger.warning("Could not transcode %s to %s", name, image_format)
+                continue
+            if buffer.tell() >= original_size:
+                continue
+            variant_name = name[: -len(".png")] + extension
+            variant_hashed = hashed_name[: -len(".png")] + extension
+            if self.exists(variant_hashed):
+                self.delete(variant_hashed)
+            self._save(variant_hashed, ContentFile(buffer.getvalue()))
+            yield variant_name, variant_hashed
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, plus AVIF/WebP negotiation for transcoded PNG images."""
+
+    def __call__(self, request):
+        path = request.path_info
+        if path.lower().endswith(".png"):
+            variants = self._image_variants(path)
+            original = self._find(path)
+            if variants and original is not None:
+                accept = request.META.get("HTTP_ACCEPT", "")
+                static_file = next(
+                    (f for mime_type, f in variants if mime_type in accept), original
+                )
+                response = self.serve(static_file, request)
+                response["Vary"] = "Accept, Accept-Encoding"
+                return response
+        return super().__call__(request)
+
+    def _find(self, url):
+        if self.autorefresh:
+            return self.find_file(url)
+        return self.files.get(url)
+
+    def _image_variants(self, path):
+        variants = []
+        for extension, _, mime_type, _ in IMAGE_VARIANTS:
+            static_file = self._find(path[: -len(".png")] + extension)
+            if static_file is not None:
+                variants.append((mime_type, static_file))
+        return variants
@@ -0,0 +1,204 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from jhonatan_projects import page_cache, staticfiles
+
+
+def write_png(path, size):
+    """A noisy PNG, which lossy formats shrink well below the original."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path, "PNG")
+
+
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = Path(tempfile.mkdtemp())
+        cls.root = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, cls.source, ignore_errors=True)
+        cls.addClassCleanup(shutil.rmtree, cls.root, ignore_errors=True)
+        write_png(cls.source / "large.png", 256)
+        write_png(cls.source / "small.png", 16)
+        overrides = override_settings(
+            STATIC_ROOT=str(cls.root),
+            STATICFILES_DIRS=[cls.source],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+        )
+        overrides.enable()
+        cls.addClassCleanup(overrides.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        manifest = json.loads((cls.root / "staticfiles.json").read_text())
+        cls.paths = manifest["paths"]
+        cls.middleware = staticfiles.StaticFilesMiddleware(
+            lambda request: HttpResponse("not static", status=404)
+        )
+
+    def supported(self):
+        return [extension for extension, *_ in staticfiles._supported_variants()]
+
+    def get(self, name, accept=""):
+        request = RequestFactory().get(
+            f"/static/{self.paths[name]}", HTTP_ACCEPT=accept
+        )
+        return self.middleware(request)
+
+    def test_large_png_is_transcoded(self):
+        self.assertIn(".webp", self.supported())
+        for extension in self.supported():
+            variant = self.paths[f"large{extension}"]
+            self.assertEqual(
+                variant, self.paths["large.png"][: -len(".png")] + extension
+            )
+            self.assertLess(
+                (self.root / variant).stat().st_size,
+                (self.root / self.paths["large.png"]).stat().st_size,
+            )
+        with Image.open(self.root / self.paths["large.webp"]) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (256, 256))
+
+    def test_small_png_is_left_alone(self):
+        self.assertLess((self.source / "small.png").stat().st_size, 32 * 1024)
+        for extension, *_ in staticfiles.IMAGE_VARIANTS:
+            self.assertNotIn(f"small{extension}", self.paths)
+            self.assertFalse((self.root / f"small{extension}").exists())
+
+    def test_unsupported_formats_are_skipped(self):
+        for extension, *_ in staticfiles.IMAGE_VARIANTS:
+            if extension not in self.supported():
+                self.assertNotIn(f"large{extension}", self.paths)
+
+    def test_middleware_negotiates_image_format(self):
+        cases = [
+            ("image/avif,image/webp,image/png,*/*", self.supported()[0]),
+            ("image/webp,*/*", ".webp"),
+            ("image/png,*/*", ".png"),
+            ("", ".png"),
+        ]
+        for accept, extension in cases:
+            with self.subTest(accept=accept):
+                response = self.get("large.png", accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response["Content-Type"], f"image/{extension.lstrip('.')}"
+                )
+                self.assertIn("Accept", response["Vary"])
+                self.assertIn("immutable", response["Cache-Control"])
+                body = b"".join(response.streaming_content)
+                response.close()
+                variant = self.paths[f"large{extension}"]
+                self.assertEqual(body, (self.root / variant).read_bytes())
+
+    def test_middleware_serves_small_png_as_is(self):
+        response = self.get("small.png", "image/avif,image/webp,*/*")
+        self.assertEqual(response["Content-Type"], "image/png")
+        vary = {value.strip() for value in response.get("Vary", "").split(",")}
+        self.assertNotIn("Accept", vary)
+        response.close()
+
+
+class PageCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.reset()
+        self.addCleanup(self.reset)
+        self.renders = 0
+
+        @page_cache.cached_page
+        def view(request):
+            self.renders += 1
+            return HttpResponse(f"page {request.path}")
+
+        self.view = view
+
+    def reset(self):
+        """Forget the process-wide cache, as a restarted worker would."""
+        page_cache._cache = None
+
+    def get(self, path="/page/", **headers):
+        return self.view(RequestFactory().get(path, **headers))
+
+    def test_page_is_rendered_once(self):
+        first = self.get()
+        second = self.get()
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("Last-Modified", second)
+        self.assertIn("must-revalidate", second["Cache-Control"])
+
+    def test_if_none_match_is_not_modified(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_if_modified_since_is_not_modified(self):
+        last_modified = self.get()["Last-Modified"]
+        response = self.get(HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        earlier = http_date(
+            page_cache.get_page_cache().get("v1:/page/")["last_modified"] - 60
+        )
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200)
+        self.assertEqual(self.renders, 1)
+
+    def test_post_is_not_cached(self):
+        request = RequestFactory().post("/page/")
+        self.view(request)
+        self.view(request)
+        self.assertEqual(self.renders, 2)
+
+    def test_lru_bound(self):
+        cache = page_cache.PageCache(max_entries=2)
+        cache.set("a", {"body": b"a"})
+        cache.set("b", {"body": b"b"})
+        cache.get("a")
+        cache.set("c", {"body": b"c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"body": b"a"})
+        self.assertEqual(cache.get("c"), {"body": b"c"})
+
+    @override_settings(PAGE_CACHE={"MAX_ENTRIES": 2})
+    def test_lru_bound_rerenders_evicted_pages(self):
+        for path in ["/a/", "/b/", "/c/", "/a/"]:
+            self.get(path)
+        self.assertEqual(self.renders, 4)
+        self.get("/c/")
+        self.assertEqual(self.renders, 4)
+
+    def test_file_backed_level_survives_restart(self):
+        with override_settings(PAGE_CACHE={"DIR": str(self.dir)}):
+            first = self.get()
+            self.reset()
+            second = self.get()
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(len(list(self.dir.glob("*.body"))), 1)
+        self.assertEqual(len(list(self.dir.glob("*.json"))), 1)
+
+    def test_unreadable_file_entry_is_a_miss(self):
+        cache = page_cache.PageCache(2, self.dir)
+        cache.set("key", {"body": b"page", "etag": '"1"'})
+        next(self.dir.glob("*.json")).write_text("{not json")
+        with mock.patch.object(page_cache.logger, "exception"):
+            self.assertIsNone(page_cache.PageCache(2, self.dir).get("key"))
+        self.assertEqual(cache.get("key")["body"], b"page")
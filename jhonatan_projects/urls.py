@@ -18,14 +18,31 @@ from django.contrib import admin
 from django.urls import path, include
 from breast_cancer.views import render_project
 from darwin_finches.views import render_project_darwin_finches
-from google_financials_dashboard.views import render_google_project
+from google_financials_dashboard.views import (
+    dash_layout,
+    live_bars,
+    render_google_project,
+    screener,
+)
 from google_financials_dashboard.dash_apps import dash_app
+from jhonatan_projects.metrics import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('breast_cancer_project/', render_project),
     path('darwin_finches_project/', render_project_darwin_finches),
+    # Cached dashboard layout, ahead of django_plotly_dash's own route.
+    path(
+        'django_plotly_dash/app/<slug:ident>/_dash-layout',
+        dash_layout,
+        {'stateless': True},
+        name='app-layout',
+    ),
     path('django_plotly_dash/', include('django_plotly_dash.urls')),
     path('google_financials_dashboard_project/', render_google_project),
+    path('google_financials_dashboard_project/screener/', screener),
+    # Polling fallback of live mode, see google_financials_dashboard.live.POLL_PATH.
+    path('google_financials_dashboard_project/live/<str:ticker>/', live_bars),
+    path('metrics', metrics_view),
 ]